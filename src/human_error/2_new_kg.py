@@ -1,5 +1,11 @@
-from py2neo import Graph, Node, Relationship
+from py2neo import Graph, Node, Relationship, Subgraph
 import json
+import os
+import sys
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "knowledge_graph"))
+from graph_schema import apply_schema, verify_plans, human_error_queries
 
 # 새 데이터베이스 연결
 uri = "bolt://localhost:7687"
@@ -13,61 +19,79 @@ input_file = "kg_hr.json"  # JSON 파일 이름
 with open(input_file, "r", encoding="utf-8") as file:
     data = json.load(file)
 
-# 데이터 삽입
-for record in data:
-    filename = record["filename"]
+# 제약 조건과 인덱스 (graph.merge가 레이블 전체를 스캔하지 않도록)
+apply_schema(graph)
+verify_plans(graph, human_error_queries())
+
+# 레코드별 서브그래프를 메모리에서 만들고 중복을 제거한 뒤 BATCH_SIZE개 레코드마다 한 트랜잭션으로 커밋
+BATCH_SIZE = 200  # 트랜잭션당 레코드 수
+
+# Task → Cause → Event → Influence → Corrective Actions: (속성, 레이블, Incident 관계, 이전 단계에서 오는 관계)
+# 원래의 중첩 루프처럼, 앞 단계가 비어 있으면 그 뒤 단계는 연결하지 않는다
+LEVELS = [
+    ("Task", "Task", "HAS_TASK", None),
+    ("Cause", "Cause", "HAS_CAUSE", "LEADS_TO"),
+    ("Event", "Event", "HAS_EVENT", "TRIGGERS"),
+    ("Influence", "Influence", "HAS_INFLUENCE", "IMPACTS"),
+    ("Corrective Actions", "CorrectiveAction", "HAS_CORRECTIVE_ACTION", "ADDRESSED_BY"),
+]
+
+
+def keyed_node(nodes, label, key, **properties):
+    # 같은 배치 안에서는 (레이블, 키)마다 Node 객체 하나만 사용
+    node = nodes.get((label, properties[key]))
+    if node is None:
+        node = Node(label, **properties)
+        node.__primarylabel__ = label
+        node.__primarykey__ = key
+        nodes[(label, properties[key])] = node
+    return node
+
+
+def add_record(nodes, relationships, record):
     attributes = record["attributes"]
     metadata = record["metadata"]
-
-    # Incident 노드 생성
-    incident_node = Node(
-        "Incident",
-        filename=filename,
+    incident_node = keyed_node(
+        nodes, "Incident", "filename",
+        filename=record["filename"],
         title=metadata["title"],
         event_date=metadata["event_date"],
         facility=metadata["facility"]["name"],
         unit=metadata["facility"]["unit"]
     )
-    graph.merge(incident_node, "Incident", "filename")
-
-    # Task → Cause → Event → Influence → Corrective Actions 연결
-    for task in attributes.get("Task", []):
-        # Task 노드 생성 (공유)
-        task_node = Node("Task", description=task)
-        graph.merge(task_node, "Task", "description")
-        # Incident → Task 관계 생성
-        graph.create(Relationship(incident_node, "HAS_TASK", task_node))
+    previous = []
+    for attribute, label, incident_type, chain_type in LEVELS:
+        if chain_type is not None and not previous:
+            break
+        current = [keyed_node(nodes, label, "description", description=item)
+                   for item in dict.fromkeys(attributes.get(attribute, []))]
+        for node in current:
+            relationships.setdefault((id(incident_node), incident_type, id(node)),
+                                     Relationship(incident_node, incident_type, node))
+            for previous_node in previous:
+                relationships.setdefault((id(previous_node), chain_type, id(node)),
+                                         Relationship(previous_node, chain_type, node))
+        previous = current
 
-        for cause in attributes.get("Cause", []):
-            # Cause 노드 생성 (공유)
-            cause_node = Node("Cause", description=cause)
-            graph.merge(cause_node, "Cause", "description")
-            # Task → Cause 관계 생성
-            graph.create(Relationship(task_node, "LEADS_TO", cause_node))
-            graph.create(Relationship(incident_node, "HAS_CAUSE", cause_node))
 
-            for event in attributes.get("Event", []):
-                # Event 노드 생성 (공유)
-                event_node = Node("Event", description=event)
-                graph.merge(event_node, "Event", "description")
-                # Cause → Event 관계 생성
-                graph.create(Relationship(cause_node, "TRIGGERS", event_node))
-                graph.create(Relationship(incident_node, "HAS_EVENT", event_node))
+def commit_batch(records):
+    nodes = {}
+    relationships = {}
+    for record in records:
+        add_record(nodes, relationships, record)
+    subgraph = Subgraph(nodes.values(), relationships.values())
+    tx = graph.begin()
+    tx.merge(subgraph)  # 노드는 기본 레이블/키로, 관계는 (시작, 타입, 끝)으로 MERGE되어 다시 실행해도 중복되지 않음
+    graph.commit(tx)
+    return len(nodes), len(relationships)
 
-                for influence in attributes.get("Influence", []):
-                    # Influence 노드 생성 (공유)
-                    influence_node = Node("Influence", description=influence)
-                    graph.merge(influence_node, "Influence", "description")
-                    # Event → Influence 관계 생성
-                    graph.create(Relationship(event_node, "IMPACTS", influence_node))
-                    graph.create(Relationship(incident_node, "HAS_INFLUENCE", influence_node))
 
-                    for action in attributes.get("Corrective Actions", []):
-                        # CorrectiveAction 노드 생성 (공유)
-                        action_node = Node("CorrectiveAction", description=action)
-                        graph.merge(action_node, "CorrectiveAction", "description")
-                        # Influence → CorrectiveAction 관계 생성
-                        graph.create(Relationship(influence_node, "ADDRESSED_BY", action_node))
-                        graph.create(Relationship(incident_node, "HAS_CORRECTIVE_ACTION", action_node))
+node_count = 0
+relationship_count = 0
+for start in tqdm(range(0, len(data), BATCH_SIZE), desc="Loading records"):
+    n, r = commit_batch(data[start:start + BATCH_SIZE])
+    node_count += n
+    relationship_count += r
 
+print(f"{len(data)} records: {node_count} nodes and {relationship_count} relationships merged.")
 print("Knowledge graph created successfully.")
@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+import pandas as pd
+import spacy
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "preprocessing"))
+from ler_store import load_table
+from extraction_schemas import build_node
+from local_extractor import ATTRIBUTES, KeywordMapper, doc_features
+
+# File paths
+LER_DF_PATH = "../../data/processed/2_updated_ler_df_latest.csv"  # Latest revision of each LER (preprocessing/6b_dedup_revisions.py)
+CLAUSE_CSV_PATH = "../../data/processed/3_ler_cfr.csv"  # Path to clause data CSV
+VOCAB_JSON_PATH = "../../data/processed/01030941_ler_kg_keyword.json"  # GPT extraction whose keywords are learned
+OUTPUT_JSON_PATH = "../../data/processed/01030941_ler_kg_keyword_local.json"  # Output JSON file, same shape as the GPT one
+LOW_CONFIDENCE_CSV_PATH = "../../data/processed/local_extraction_low_confidence.csv"  # Incidents worth sending to GPT
+
+# spaCy settings
+SPACY_MODEL = "en_core_web_sm"
+NUM_WORKERS = os.cpu_count()  # Processes for nlp.pipe
+BATCH_SIZE = 64  # Incidents per nlp.pipe batch
+MAX_TEXT_CHARS = 20000  # Long narratives are cut; the first part carries the event, cause and actions
+
+# Keyword mapping
+MAX_KEYWORDS = 3  # Keywords per attribute, like 7_extract_entity_keyword.py
+MIN_SIMILARITY = 0.1  # Below this, the attribute falls back to a noun chunk
+LOW_CONFIDENCE_THRESHOLD = 0.25  # Incidents whose weakest attribute scores below this are listed for GPT
+USE_GPT_FOR_LOW_CONFIDENCE = True  # Low-confidence incidents that VOCAB_JSON_PATH already covers keep GPT's keywords
+
+
+def combined_text(row):
+    # Combine relevant columns into a single text input
+    return " ".join(
+        str(row.get(col, "")) for col in ["Title", "Abstract", "Narrative"]
+    )
+
+
+def main():
+    # Load datasets
+    ler_df = load_table(LER_DF_PATH, dates_as_text=True)
+    clause_df = load_table(CLAUSE_CSV_PATH, columns=["filename", "CFR"])
+    ler_df = pd.merge(ler_df, clause_df, left_on="File Name", right_on="filename", how="left")
+    rows = [row for _, row in ler_df.iterrows()]
+
+    # Parse all incidents in batches on all cores; NER is not needed
+    nlp = spacy.load(SPACY_MODEL, disable=["ner"])
+    texts = (combined_text(row)[:MAX_TEXT_CHARS] for row in rows)
+    docs = nlp.pipe(texts, n_process=NUM_WORKERS, batch_size=BATCH_SIZE)
+    features = [doc_features(doc) for doc in tqdm(docs, total=len(rows), desc="Parsing incidents")]
+    features_by_file = {row.get("File Name", ""): f for row, f in zip(rows, features)}
+
+    # Learn the keyword vocabulary from the GPT extraction
+    gpt_nodes = []
+    if os.path.exists(VOCAB_JSON_PATH):
+        with open(VOCAB_JSON_PATH, "r", encoding="utf-8") as f:
+            gpt_nodes = json.load(f)
+    else:
+        print(f"{VOCAB_JSON_PATH} not found; all keywords come from noun chunks.")
+    mapper = KeywordMapper().fit(features_by_file, gpt_nodes)
+    for attribute in ATTRIBUTES:
+        print(f"{attribute}: {mapper.vocabulary_size(attribute)} keywords learned")
+    gpt_by_file = {node.get("filename"): node for node in gpt_nodes}
+
+    nodes = []
+    low_confidence = []
+    kept_gpt = 0
+    for row, f in zip(rows, features):
+        filename = row.get("File Name", "")
+        attributes = {}
+        confidence = {}
+        for attribute in ATTRIBUTES:
+            attributes[attribute], confidence[attribute] = mapper.predict(
+                f, attribute, max_keywords=MAX_KEYWORDS, min_similarity=MIN_SIMILARITY
+            )
+        attributes["Similar Events"] = []
+
+        weakest = min(confidence, key=confidence.get)
+        if confidence[weakest] < LOW_CONFIDENCE_THRESHOLD:
+            if USE_GPT_FOR_LOW_CONFIDENCE and filename in gpt_by_file:
+                attributes = gpt_by_file[filename]["attributes"]
+                kept_gpt += 1
+            else:
+                low_confidence.append({
+                    "filename": filename,
+                    "confidence": round(confidence[weakest], 4),
+                    "weakest_attribute": weakest
+                })
+
+        nodes.append(build_node(row, attributes))
+
+    with open(OUTPUT_JSON_PATH, "w", encoding="utf-8") as f:
+        json.dump(nodes, f, indent=4, ensure_ascii=False)
+    pd.DataFrame(low_confidence, columns=["filename", "confidence", "weakest_attribute"]).to_csv(
+        LOW_CONFIDENCE_CSV_PATH, index=False
+    )
+
+    print(f"\nKnowledge graph ({len(nodes)} nodes) saved to {OUTPUT_JSON_PATH}.")
+    print(f"{kept_gpt} low-confidence incidents kept their GPT keywords; "
+          f"{len(low_confidence)} listed in {LOW_CONFIDENCE_CSV_PATH}.")
+
+
+if __name__ == "__main__":
+    main()
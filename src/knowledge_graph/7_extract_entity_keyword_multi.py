@@ -0,0 +1,53 @@
+from jsonl_checkpoint import JsonlWriter, completed_filenames, compact
+from extraction_schemas import SCHEMAS, MULTI_SYSTEM_PROMPT, build_multi_template, split_multi_response, build_node
+from schema_extraction import RESUME, checkpoint_path, load_incidents, extract_rows
+
+# Schemas answered together in one request per incident; each keeps its own output file
+SCHEMA_NAMES = ["concise", "hsi", "procedure"]
+SELECTED_SCHEMAS = [SCHEMAS[name] for name in SCHEMA_NAMES]
+OUTPUT_JSONL_PATHS = {
+    schema.name: checkpoint_path(schema.output_json_path) for schema in SELECTED_SCHEMAS
+}  # Checkpoint files, compacted into each schema's output JSON
+
+# Batched mode packs several incidents into one request; the combined prompt needs a larger budget per request
+BATCH_MODE = False
+BATCH_TOKEN_BUDGET = 8000  # Prompt plus reserved output tokens per batched request
+MAX_BATCH_SIZE = 5  # Incidents per batched request
+
+# One prompt covering every selected schema; {text} is replaced by the incident description
+PROMPT_TEMPLATE = build_multi_template(SELECTED_SCHEMAS)
+SYSTEM_PROMPT = MULTI_SYSTEM_PROMPT
+
+
+def main():
+    ler_df = load_incidents()
+
+    # Incidents are only skipped when every schema already has them, so adding a schema reruns the corpus for it
+    done = set.intersection(*(completed_filenames(path) for path in OUTPUT_JSONL_PATHS.values())) if RESUME else set()
+    rows = [row for _, row in ler_df.iterrows() if row.get("File Name", "") not in done]
+    print(f"{len(done)} incidents already extracted for all schemas, {len(rows)} to go.")
+
+    # Fan the combined answer out to the per-schema checkpoint files; only answers holding every schema
+    # get here, the others are neither cached nor checkpointed and go to the retry pass
+    def write_answer(row, answer):
+        parts = split_multi_response(answer, SELECTED_SCHEMAS)
+        for schema in SELECTED_SCHEMAS:
+            writers[schema.name].write(build_node(row, schema.normalize(parts[schema.name])))
+
+    writers = {name: JsonlWriter(path, resume=RESUME) for name, path in OUTPUT_JSONL_PATHS.items()}
+    try:
+        extract_rows(rows, PROMPT_TEMPLATE, SYSTEM_PROMPT, sum(schema.max_tokens for schema in SELECTED_SCHEMAS),
+                     write_answer, batch_mode=BATCH_MODE, batch_token_budget=BATCH_TOKEN_BUDGET,
+                     max_batch_size=MAX_BATCH_SIZE, required=SCHEMA_NAMES)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    # Compact each checkpoint file into the JSON array read by the 8_kg scripts
+    for schema in SELECTED_SCHEMAS:
+        node_count = compact(OUTPUT_JSONL_PATHS[schema.name], schema.output_json_path)
+        print(f"\n{schema.name}: {node_count} nodes saved to {schema.output_json_path}.")
+
+
+if __name__ == "__main__":
+    main()
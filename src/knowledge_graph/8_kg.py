@@ -1,22 +1,55 @@
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 from neo4j import GraphDatabase
 import json
+import os
+import sys
 import pandas as pd
 from tqdm import tqdm
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "preprocessing"))
+from ler_revisions import latest_nodes
+from embedding_store import EmbeddingStore
+from graph_schema import apply_schema, verify_plans, loader_queries
+from graph_loader import BulkLoader, ParallelLoader, RecordingDriver, CFR_NODE_QUERY, cfr_rows, similarity_query
+from graph_sync import (DETACH_INCIDENT_QUERY, DELETE_INCIDENT_QUERY, incident_properties, existing_hashes, filename_rows,
+                        plan_upsert)
+from similarity_engine import attribute_matrices, similar_pairs, cross_pairs, ann_pairs, recall_report
+
 # Load the model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+MODEL_NAME = "all-MiniLM-L6-v2"
+model = SentenceTransformer(MODEL_NAME)
+
+# Embeddings already computed by any run (or by the web app) are read from disk instead of re-encoded
+EMBEDDING_STORE_PATH = "../../data/processed/embedding_store"
+embedding_store = EmbeddingStore(EMBEDDING_STORE_PATH, MODEL_NAME, model.get_sentence_embedding_dimension())
+
+# Similarity settings
+SIMILARITY_THRESHOLD = 0.8  # Minimum Task similarity for a SIMILAR_TASK edge
+ENCODE_BATCH_SIZE = 256  # Texts per model.encode batch
+SIMILARITY_BLOCK_SIZE = 512  # Incidents per block of the pairwise similarity matrix
+SIMILARITY_MODE = "exact"  # "exact" compares all pairs; "ann" links each incident to its top-k Task neighbours (needs faiss-cpu)
+ANN_INDEX = "hnsw"  # "hnsw" or "ivf"
+ANN_TOP_K = 50  # Neighbours retrieved per incident in "ann" mode
+ANN_RECALL_SAMPLE = 500  # Incidents checked against the exact method after an "ann" run; 0 skips the report
 
 # Neo4j connection settings
 uri = "bolt://localhost:7687"
 username = "neo4j"
 password = "tkfkd7274"
-driver = GraphDatabase.driver(uri, auth=(username, password))
+LOAD_BATCH_SIZE = 1000  # Rows per UNWIND transaction
+LOAD_WORKERS = 4  # Worker sessions; more than 1 loads shared nodes first, then incidents partitioned across workers
+DRY_RUN = False  # Record the Cypher statements instead of sending them (graph_loader.RecordingDriver)
+INCREMENTAL = False  # Upsert new/changed incidents and link only those, instead of deleting and rebuilding the graph
+VERIFY_QUERY_PLANS = True  # EXPLAIN the load queries first and stop if any of them scans a whole label
+driver = RecordingDriver() if DRY_RUN else GraphDatabase.driver(uri, auth=(username, password))
 
 # Load JSON data
 with open("../../data/processed/01030941_ler_kg_keyword_cocise.json", "r", encoding="utf-8") as f:
     data = json.load(f)
 
+# Keep only the latest revision of each LER; older revisions would become near-duplicate incidents
+data = latest_nodes(data)
+
 # Load CFR data
 cfr_file = "../../data/processed/3_cfr_concise.csv"
 cfr_data = pd.read_csv(cfr_file)
@@ -30,136 +63,93 @@ def delete_all_nodes_and_relationships(driver):
         session.run("MATCH (n) DETACH DELETE n")
         print("All existing nodes and relationships have been deleted.")
 
-def insert_cfr_nodes(tx, cfr, content_3, content_4):
-    """Insert CFR nodes into Neo4j."""
-    tx.run(
-        """
-        MERGE (c:CFR {cfr: $cfr})
-        SET c.upper = $upper, c.lower = $lower
-        """,
-        cfr=cfr, upper=content_3, lower=content_4
-    )
-
-def insert_nodes_and_relationships(tx, event_data):
-    """Insert nodes and relationships for a single event."""
-    # Insert Incident node
-    tx.run(
-        """
-        MERGE (i:Incident {filename: $filename})
-        SET i.title = $title, i.date = $date
-        """,
-        filename=event_data["filename"],
-        title=event_data["metadata"]["title"],
-        date=event_data["metadata"]["event_date"]
-    )
-
-    # Insert and relate attributes
-    for attribute, label in [("Task", "RELATED_TO_TASK"),
-                             ("Event", "HAS_EVENT"),
-                             ("Cause", "HAS_CAUSE"),
-                             ("Influence", "HAS_INFLUENCE"),
-                             ("Corrective Actions", "HAS_CORRECTIVE_ACTIONS")]:
-        for item in event_data["attributes"].get(attribute, []):
-            tx.run(
-                f"""
-                MERGE (n:{attribute.replace(' ', '')} {{description: $item}})
-                MERGE (i:Incident {{filename: $filename}})
-                MERGE (i)-[:{label}]->(n)
-                """,
-                item=item, filename=event_data["filename"]
-            )
-
-    # Insert and relate Facility
-    facility = event_data["metadata"]["facility"]
-    tx.run(
-        """
-        MERGE (f:Facility {name: $facility_name, unit: $facility_unit})
-        MERGE (i:Incident {filename: $filename})
-        MERGE (i)-[:OCCURRED_AT]->(f)
-        """,
-        facility_name=facility["name"],
-        facility_unit=facility["unit"],
-        filename=event_data["filename"]
-    )
-
-    # Insert and relate CFR clauses
-    clauses = event_data["metadata"].get("clause", "").split(", ")
-    for clause in clauses:
-        if clause in cfr_dict:
-            upper = cfr_dict[clause]["content_3"]
-            lower = cfr_dict[clause]["content_4"]
-            tx.run(
-                """
-                MERGE (cl:CFR {cfr: $clause})
-                SET cl.upper = $upper, cl.lower = $lower
-                MERGE (i:Incident {filename: $filename})
-                MERGE (i)-[:REGULATED_BY]->(cl)
-                """,
-                clause=clause, upper=upper, lower=lower, filename=event_data["filename"]
-            )
-
-def calculate_similarity(attribute, data1, data2):
-    """Calculate similarity between two events for a specific attribute."""
-    text1 = " ".join(data1["attributes"].get(attribute, []))
-    text2 = " ".join(data2["attributes"].get(attribute, []))
-    if text1 and text2:
-        emb1 = model.encode(text1, convert_to_tensor=True)
-        emb2 = model.encode(text2, convert_to_tensor=True)
-        return util.pytorch_cos_sim(emb1, emb2).item()
-    return 0.0
-
-def insert_task_based_relationship(tx, filename1, filename2, task1, task2, similarities):
-    """Insert a task-based relationship between two incidents."""
-    tx.run(
-        """
-        MATCH (e1:Incident {filename: $filename1}), (e2:Incident {filename: $filename2}),
-              (t1:Task {description: $task1}), (t2:Task {description: $task2})
-        MERGE (e1)-[r:SIMILAR_TASK]->(e2)
-        SET r.task_similarity = $task_similarity,
-            r.cause_similarity = $cause_similarity,
-            r.event_similarity = $event_similarity,
-            r.influence_similarity = $influence_similarity,
-            r.task1 = $task1,
-            r.task2 = $task2
-        """,
-        filename1=filename1, filename2=filename2,
-        task1=task1, task2=task2,
-        **similarities
-    )
-
-# Step 1: Clear existing data
-delete_all_nodes_and_relationships(driver)
+# Keyword attributes: (attribute, node label, relationship from the Incident)
+KEYWORD_ATTRIBUTES = [("Task", "Task", "RELATED_TO_TASK"),
+                      ("Event", "Event", "HAS_EVENT"),
+                      ("Cause", "Cause", "HAS_CAUSE"),
+                      ("Influence", "Influence", "HAS_INFLUENCE"),
+                      ("Corrective Actions", "CorrectiveActions", "HAS_CORRECTIVE_ACTIONS")]
+
+# Task-based relationship between two incidents; the row's properties become the edge properties
+SIMILAR_TASK_QUERY = similarity_query("SIMILAR_TASK", "Task", "task1", "task2")
+
+if LOAD_WORKERS > 1:
+    loader = ParallelLoader(driver, batch_size=LOAD_BATCH_SIZE, workers=LOAD_WORKERS)
+else:
+    loader = BulkLoader(driver, batch_size=LOAD_BATCH_SIZE)
+
+def prepare_schema():
+    """Constraints and indexes, so every MERGE/MATCH below is an index seek instead of a label scan."""
+    with driver.session() as session:
+        apply_schema(session)
+        if VERIFY_QUERY_PLANS and not DRY_RUN:
+            verify_plans(session, loader_queries())
+
+# Step 1: Clear existing data, or only what an incremental run replaces
+if INCREMENTAL:
+    # The graph is kept, so its lookups need the indexes already
+    prepare_schema()
+    plan = plan_upsert(data, existing_hashes(driver))
+    print(f"{len(plan['new'])} new, {len(plan['changed'])} changed, {len(plan['unchanged'])} unchanged incidents; "
+          f"{len(plan['superseded'])} superseded revisions.")
+    upsert_rows = plan["new"] + plan["changed"]
+    # Superseded incidents are detached first, so keyword nodes only they used are removed as well
+    detached = [data[k]["filename"] for k in plan["changed"]] + plan["superseded"]
+    loader.load("Detach changed incidents", DETACH_INCIDENT_QUERY, filename_rows(detached))
+    loader.load("Delete superseded incidents", DELETE_INCIDENT_QUERY, filename_rows(plan["superseded"]))
+else:
+    # Wiped first, so duplicate keys left by an interrupted load cannot block the constraints
+    delete_all_nodes_and_relationships(driver)
+    prepare_schema()
+    upsert_rows = list(range(len(data)))
 
 # Step 2: Insert CFR nodes
-with driver.session() as session:
-    for cfr, values in cfr_dict.items():
-        session.write_transaction(insert_cfr_nodes, cfr, values["content_3"], values["content_4"])
+loader.load("CFR", CFR_NODE_QUERY, cfr_rows(cfr_dict))
 
-# Step 3: Insert all nodes and relationships
-with driver.session() as session:
-    for event in data:
-        session.write_transaction(insert_nodes_and_relationships, event)
+# Step 3: Insert all nodes and relationships, one UNWIND batch of rows per transaction
+loader.load_events([data[k] for k in upsert_rows], cfr_dict, KEYWORD_ATTRIBUTES, incident_properties)
 
 # Step 4: Calculate similarities and create relationships
-with driver.session() as session:
-    for i in tqdm(range(len(data)), desc="Processing incidents"):
-        event1 = data[i]
-        for task1 in event1["attributes"].get("Task", []):
-            for j in range(i + 1, len(data)):
-                event2 = data[j]
-                for task2 in event2["attributes"].get("Task", []):
-                    similarities = {
-                        "task_similarity": calculate_similarity("Task", event1, event2),
-                        "cause_similarity": calculate_similarity("Cause", event1, event2),
-                        "event_similarity": calculate_similarity("Event", event1, event2),
-                        "influence_similarity": calculate_similarity("Influence", event1, event2)
-                    }
-                    if similarities["task_similarity"] >= 0.8:
-                        print(f"Connecting {event1['filename']} and {event2['filename']} based on Task '{task1}' and '{task2}' with similarity {similarities['task_similarity']:.2f}")
-                        session.write_transaction(
-                            insert_task_based_relationship,
-                            event1["filename"], event2["filename"], task1, task2, similarities
-                        )
-
+# Each attribute text is encoded once; all pairs are scored as blocked matrix products
+matrices = attribute_matrices(model, data, ["Task", "Cause", "Event", "Influence"], batch_size=ENCODE_BATCH_SIZE, store=embedding_store)
+if INCREMENTAL:
+    # Only pairs with a new or changed incident; unchanged pairs keep their edges
+    pairs = cross_pairs(matrices, "Task", upsert_rows, threshold=SIMILARITY_THRESHOLD, block_size=SIMILARITY_BLOCK_SIZE)
+elif SIMILARITY_MODE == "ann":
+    # Only each incident's top-k Task neighbours are compared, so the cost grows with n log n instead of n^2
+    pairs = ann_pairs(matrices, "Task", threshold=SIMILARITY_THRESHOLD, top_k=ANN_TOP_K, index_type=ANN_INDEX)
+else:
+    pairs = similar_pairs(matrices, "Task", threshold=SIMILARITY_THRESHOLD, block_size=SIMILARITY_BLOCK_SIZE)
+linked = set()
+
+def similar_task_rows():
+    for i, j, scores in tqdm(pairs, desc="Linking similar incidents"):
+        linked.add((i, j))
+        event1, event2 = data[i], data[j]
+        similarities = {
+            "task_similarity": scores["Task"],
+            "cause_similarity": scores["Cause"],
+            "event_similarity": scores["Event"],
+            "influence_similarity": scores["Influence"]
+        }
+        # The edge is merged per incident pair, so the last task of each incident ends up on it
+        task1 = event1["attributes"]["Task"][-1]
+        task2 = event2["attributes"]["Task"][-1]
+        print(f"Connecting {event1['filename']} and {event2['filename']} based on Task '{task1}' and '{task2}' with similarity {similarities['task_similarity']:.2f}")
+        yield {
+            "filename1": event1["filename"], "filename2": event2["filename"],
+            "task1": task1, "task2": task2,
+            "properties": dict(similarities, task1=task1, task2=task2)
+        }
+
+loader.load("SIMILAR_TASK", SIMILAR_TASK_QUERY, similar_task_rows())
+loader.report()
+
+if SIMILARITY_MODE == "ann" and ANN_RECALL_SAMPLE and not INCREMENTAL:
+    report = recall_report(matrices, "Task", linked, threshold=SIMILARITY_THRESHOLD, sample_size=ANN_RECALL_SAMPLE)
+    print(f"ANN recall on {report['sampled_incidents']} sampled incidents: {report['recall']:.1%} "
+          f"({report['ann_pairs']} linked, {report['exact_pairs']} by the exact method)")
+
+print(f"{len(linked)} SIMILAR_TASK relationships.")
 print("Task-based relationships and similarity data have been added to Neo4j.")
 driver.close()
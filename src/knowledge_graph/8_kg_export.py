@@ -0,0 +1,76 @@
+from sentence_transformers import SentenceTransformer
+import json
+import os
+import sys
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "preprocessing"))
+from ler_revisions import latest_nodes
+from admin_import import ImportWriter
+from graph_sync import incident_properties
+from embedding_store import EmbeddingStore
+from similarity_engine import attribute_matrices, similar_pairs
+
+# Writes the graph 8_kg.py builds as neo4j-admin import files, for loading an empty database offline
+
+# File paths
+INPUT_JSON_PATH = "../../data/processed/01030941_ler_kg_keyword_cocise.json"
+CFR_CSV_PATH = "../../data/processed/3_cfr_concise.csv"
+OUTPUT_DIR = "../../data/processed/neo4j_import"  # Node and relationship CSV files
+DATABASE = "neo4j"  # Database the printed neo4j-admin command imports into
+
+# Similarity settings (as in 8_kg.py)
+INCLUDE_SIMILARITY = True  # Also write the SIMILAR_TASK relationships
+MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_STORE_PATH = "../../data/processed/embedding_store"
+SIMILARITY_THRESHOLD = 0.8
+ENCODE_BATCH_SIZE = 256
+SIMILARITY_BLOCK_SIZE = 512
+
+# Keyword attributes: (attribute, node label, relationship from the Incident)
+KEYWORD_ATTRIBUTES = [("Task", "Task", "RELATED_TO_TASK"),
+                      ("Event", "Event", "HAS_EVENT"),
+                      ("Cause", "Cause", "HAS_CAUSE"),
+                      ("Influence", "Influence", "HAS_INFLUENCE"),
+                      ("Corrective Actions", "CorrectiveActions", "HAS_CORRECTIVE_ACTIONS")]
+
+SIMILARITY_PROPERTIES = ["task_similarity", "cause_similarity", "event_similarity", "influence_similarity", "task1", "task2"]
+
+
+def similar_task_records(data):
+    model = SentenceTransformer(MODEL_NAME)
+    embedding_store = EmbeddingStore(EMBEDDING_STORE_PATH, MODEL_NAME, model.get_sentence_embedding_dimension())
+    matrices = attribute_matrices(model, data, ["Task", "Cause", "Event", "Influence"], batch_size=ENCODE_BATCH_SIZE, store=embedding_store)
+    for i, j, scores in similar_pairs(matrices, "Task", threshold=SIMILARITY_THRESHOLD, block_size=SIMILARITY_BLOCK_SIZE):
+        event1, event2 = data[i], data[j]
+        yield {
+            "start": event1["filename"], "end": event2["filename"],
+            "task_similarity": scores["Task"],
+            "cause_similarity": scores["Cause"],
+            "event_similarity": scores["Event"],
+            "influence_similarity": scores["Influence"],
+            "task1": event1["attributes"]["Task"][-1],
+            "task2": event2["attributes"]["Task"][-1]
+        }
+
+
+def main():
+    with open(INPUT_JSON_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data = latest_nodes(data)
+
+    cfr_data = pd.read_csv(CFR_CSV_PATH)
+    cfr_dict = cfr_data.set_index("CFR")[["content_3", "content_4"]].to_dict(orient="index")
+
+    writer = ImportWriter(OUTPUT_DIR)
+    writer.export_events(data, cfr_dict, KEYWORD_ATTRIBUTES, incident_properties)
+    if INCLUDE_SIMILARITY:
+        writer.write_relationships("SIMILAR_TASK", "Incident", "Incident", similar_task_records(data),
+                                   properties=SIMILARITY_PROPERTIES)
+
+    print("\nStop Neo4j, then import the files into an empty database with:\n")
+    print(writer.command(DATABASE))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,137 @@
+import os
+import time
+import random
 from neo4j import GraphDatabase
+from tqdm import tqdm
+from graph_loader import is_retryable
+from jsonl_checkpoint import JsonlWriter, completed_filenames
 
-def restructure_graph_relationships(graph):
+# Restructuring settings
+BATCH_SIZE = 500  # Incidents per transaction
+INCREMENTAL = False  # Only incidents not restructured yet (new, or changed since their last restructuring)
+RESUME = True  # Record the restructured incidents in CHECKPOINT_PATH and skip them when an interrupted full run continues
+CHECKPOINT_PATH = "../../data/processed/9_restruct_checkpoint.jsonl"
+MAX_RETRIES = 5  # Retries of a batch after deadlocks or other transient errors
+
+# Per-incident derivation of the logical flow: Task -> Cause -> Event -> Influence -> Corrective Action.
+# Each query only expands the incidents of one batch, so memory and transaction size stay bounded.
+RESTRUCTURE_QUERIES = [
+    # Task → Cause
+    """
+    UNWIND $filenames AS filename
+    MATCH (i:Incident {filename: filename})-[:RELATED_TO_TASK]->(t:Task)
+    MATCH (i)-[:HAS_CAUSE]->(c:Cause)
+    MERGE (t)-[:CAUSES]->(c)
+    """,
+    # Cause → Event
+    """
+    UNWIND $filenames AS filename
+    MATCH (i:Incident {filename: filename})-[:HAS_CAUSE]->(c:Cause)
+    MATCH (i)-[:HAS_EVENT]->(e:Event)
+    MERGE (c)-[:TRIGGERS]->(e)
+    """,
+    # Event → Influence
+    """
+    UNWIND $filenames AS filename
+    MATCH (i:Incident {filename: filename})-[:HAS_EVENT]->(e:Event)
+    MATCH (i)-[:HAS_INFLUENCE]->(inf:Influence)
+    MERGE (e)-[:IMPACTS]->(inf)
+    """,
+    # Influence → Corrective Action (8_kg.py labels these nodes CorrectiveActions)
+    """
+    UNWIND $filenames AS filename
+    MATCH (i:Incident {filename: filename})-[:HAS_INFLUENCE]->(inf:Influence)
+    MATCH (i)-[:HAS_CORRECTIVE_ACTIONS]->(ca:CorrectiveActions)
+    MERGE (inf)-[:ADDRESSED_BY]->(ca)
+    """
+]
+
+# Restructured incidents remember the content_hash they were restructured at (8_kg.py sets it)
+MARK_QUERY = """
+UNWIND $filenames AS filename
+MATCH (i:Incident {filename: filename})
+SET i.restructured_hash = coalesce(i.content_hash, "")
+"""
+
+ALL_INCIDENTS_QUERY = """
+MATCH (i:Incident)
+RETURN i.filename AS filename
+ORDER BY filename
+"""
+
+PENDING_INCIDENTS_QUERY = """
+MATCH (i:Incident)
+WHERE i.restructured_hash IS NULL OR i.restructured_hash <> coalesce(i.content_hash, "")
+RETURN i.filename AS filename
+ORDER BY filename
+"""
+
+
+def _restructure_batch(tx, filenames):
+    for query in RESTRUCTURE_QUERIES:
+        tx.run(query, filenames=filenames)
+    tx.run(MARK_QUERY, filenames=filenames)
+
+
+def restructure_graph_relationships(graph, batch_size=BATCH_SIZE, incremental=False, checkpoint_path=None,
+                                    max_retries=MAX_RETRIES):
     """
     Restructure relationships in the Neo4j graph to establish logical flow:
     Task -> Cause -> Event -> Influence -> Corrective Action
+
+    Incidents are processed in filename order, batch_size per transaction. A full run appends the
+    filenames of every committed batch to checkpoint_path and skips those incidents when it is
+    continued, including any added to the graph in between; an incremental run only takes
+    incidents not restructured at their current content.
     """
-    queries = [
-        # Task → Cause
-        """
-        MATCH (i:Incident)-[:RELATED_TO_TASK]->(t:Task), (i)-[:HAS_CAUSE]->(c:Cause)
-        MERGE (t)-[:CAUSES]->(c)
-        """,
-        # Cause → Event
-        """
-        MATCH (i:Incident)-[:HAS_CAUSE]->(c:Cause), (i)-[:HAS_EVENT]->(e:Event)
-        MERGE (c)-[:TRIGGERS]->(e)
-        """,
-        # Event → Influence
-        """
-        MATCH (i:Incident)-[:HAS_EVENT]->(e:Event), (i)-[:HAS_INFLUENCE]->(inf:Influence)
-        MERGE (e)-[:IMPACTS]->(inf)
-        """,
-        # Influence → Corrective Action
-        """
-        MATCH (i:Incident)-[:HAS_INFLUENCE]->(inf:Influence), (i)-[:HAS_CORRECTIVE_ACTIONS]->(ca:CorrectiveAction)
-        MERGE (inf)-[:ADDRESSED_BY]->(ca)
-        """
-    ]
-    
-    for query in queries:
-        graph.run(query)
+    query = PENDING_INCIDENTS_QUERY if incremental else ALL_INCIDENTS_QUERY
+    filenames = [record["filename"] for record in graph.run(query)]
+
+    checkpointing = bool(checkpoint_path) and not incremental
+    if checkpointing:
+        done = completed_filenames(checkpoint_path)
+        if done:
+            filenames = [filename for filename in filenames if filename not in done]
+            print(f"Resuming: {len(done)} incidents already restructured.")
+
+    batches = [filenames[start:start + batch_size] for start in range(0, len(filenames), batch_size)]
+    writer = JsonlWriter(checkpoint_path) if checkpointing else None
+    try:
+        for batch in tqdm(batches, desc="Restructuring incidents"):
+            for attempt in range(max_retries + 1):
+                try:
+                    graph.write_transaction(_restructure_batch, batch)
+                    break
+                except Exception as e:
+                    if attempt == max_retries or not is_retryable(e):
+                        raise
+                    time.sleep(random.uniform(0, min(5.0, 0.1 * 2 ** attempt)))
+            if writer:
+                for filename in batch:
+                    writer.write({"filename": filename})
+                writer.checkpoint()
+    finally:
+        if writer:
+            writer.close()
+
+    # A finished full run starts from the beginning next time
+    if checkpointing and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print(f"{len(filenames)} incidents restructured in {len(batches)} batches.")
+
 
 if __name__ == "__main__":
     # Neo4j connection settings
     uri = "bolt://localhost:7687"
     username = "neo4j"
     password = "tkfkd7274"
-    
+
     # Connect to Neo4j
     graph = GraphDatabase.driver(uri, auth=(username, password))
-    
+
     # Restructure relationships
     with graph.session() as session:
-        restructure_graph_relationships(session)
-    
+        restructure_graph_relationships(session, batch_size=BATCH_SIZE, incremental=INCREMENTAL,
+                                        checkpoint_path=CHECKPOINT_PATH if RESUME else None)
+
     print("Graph relationships have been restructured.")
@@ -0,0 +1,143 @@
+"""
+Offline `neo4j-admin database import` files for a from-scratch knowledge graph.
+
+The 8_kg scripts MERGE every node and relationship into a running database, which is the slowest
+way to fill an empty one. ImportWriter writes the same graph as header + data CSV files instead:
+
+    nodes_Incident.csv        filename:ID(Incident),title,date,revisions:string[],:LABEL
+    nodes_Task.csv            description:ID(Task),:LABEL
+    nodes_Facility.csv        :ID(Facility),name,unit,:LABEL
+    nodes_CFR.csv             cfr:ID(CFR),upper,lower,:LABEL
+    rels_RELATED_TO_TASK.csv  :START_ID(Incident),:END_ID(Task),:TYPE
+    rels_SIMILAR_TASK.csv     :START_ID(Incident),:END_ID(Incident),task_similarity:double,...,:TYPE
+
+Every label has its own ID space, so a Task and an Event with the same description stay two nodes,
+and nodes and relationships are de-duplicated the way MERGE would. The rows come from the same
+generators graph_loader.BulkLoader sends, so both paths build the same graph. command() returns the
+neo4j-admin call that imports the files into a stopped, empty database.
+"""
+import csv
+import os
+
+from graph_loader import incident_rows, keyword_rows, facility_rows, cfr_rows, clause_rows
+
+ARRAY_DELIMITER = ";"
+
+
+def _is_missing(value):
+    return value is None or value == "" or (isinstance(value, float) and value != value)  # NaN from pandas
+
+
+def property_type(values):
+    """neo4j-admin type of a property column, from the values it holds."""
+    values = [value for value in values if not _is_missing(value)]
+    if values and all(isinstance(value, bool) for value in values):
+        return "boolean"
+    if values and all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return "long"
+    if values and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return "double"
+    if any(isinstance(value, (list, tuple)) for value in values):
+        return "string[]"
+    return "string"
+
+
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        return ARRAY_DELIMITER.join(str(item) for item in value)
+    if _is_missing(value):
+        return ""  # An empty unquoted field leaves the property unset
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def _property_columns(records, names):
+    # Explicit types for everything but plain strings
+    columns = []
+    for name in names:
+        kind = property_type([record.get(name) for record in records])
+        columns.append(name if kind == "string" else f"{name}:{kind}")
+    return columns
+
+
+class ImportWriter:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.node_files = []
+        self.relationship_files = []
+
+    def _write(self, filename, header, lines):
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(lines)
+        return path
+
+    def write_nodes(self, label, records, id_field=None, id_key=None, properties=()):
+        """
+        records: dicts of properties. The ID is the id_field property (also stored on the node), or
+        id_key(record) when the node has no single key property (Facility: name and unit).
+        """
+        unique = {}
+        for record in records:
+            key = record[id_field] if id_field else id_key(record)
+            unique.setdefault(key, record)  # The first record wins, like the first MERGE
+        records = list(unique.values())
+        id_column = f"{id_field}:ID({label})" if id_field else f":ID({label})"
+        header = [id_column] + _property_columns(records, properties) + [":LABEL"]
+        lines = ([key] + [_cell(record.get(name)) for name in properties] + [label]
+                 for key, record in zip(unique, records))
+        path = self._write(f"nodes_{label}.csv", header, lines)
+        self.node_files.append(path)
+        print(f"{label}: {len(records)} nodes -> {path}")
+        return len(records)
+
+    def write_relationships(self, rel_type, start_label, end_label, records, properties=()):
+        """records: dicts with "start" and "end" IDs plus properties; one relationship per (start, end), like MERGE."""
+        unique = {}
+        for record in records:
+            unique[(record["start"], record["end"])] = record  # Later SETs overwrite earlier ones
+        records = list(unique.values())
+        header = ([f":START_ID({start_label})", f":END_ID({end_label})"] + _property_columns(records, properties)
+                  + [":TYPE"])
+        lines = ([record["start"], record["end"]] + [_cell(record.get(name)) for name in properties] + [rel_type]
+                 for record in records)
+        path = self._write(f"rels_{rel_type}.csv", header, lines)
+        self.relationship_files.append(path)
+        print(f"{rel_type}: {len(records)} relationships -> {path}")
+        return len(records)
+
+    def export_events(self, data, cfr_dict, keyword_attributes, incident_properties):
+        """Incidents, their keyword nodes, facilities and CFR clauses, as BulkLoader.load_events loads them."""
+        incidents = [dict(row["properties"], filename=row["filename"]) for row in incident_rows(data, incident_properties)]
+        names = list(dict.fromkeys(name for record in incidents for name in record if name != "filename"))
+        self.write_nodes("Incident", incidents, id_field="filename", properties=names)
+
+        for attribute, label, relationship in keyword_attributes:
+            rows = list(keyword_rows(data, attribute))
+            self.write_nodes(label, rows, id_field="description")
+            self.write_relationships(relationship, "Incident", label,
+                                     ({"start": row["filename"], "end": row["description"]} for row in rows))
+
+        facility_id = lambda row: f"{row['name']}|{row['unit']}"
+        rows = list(facility_rows(data))
+        self.write_nodes("Facility", rows, id_key=facility_id, properties=["name", "unit"])
+        self.write_relationships("OCCURRED_AT", "Incident", "Facility",
+                                 ({"start": row["filename"], "end": facility_id(row)} for row in rows))
+
+        # clause_rows only yields clauses that are in cfr_dict, so every CFR node comes from cfr_rows
+        self.write_nodes("CFR", cfr_rows(cfr_dict), id_field="cfr", properties=["upper", "lower"])
+        self.write_relationships("REGULATED_BY", "Incident", "CFR",
+                                 ({"start": row["filename"], "end": row["cfr"]} for row in clause_rows(data, cfr_dict)))
+
+    def command(self, database="neo4j"):
+        """neo4j-admin (Neo4j 5) call that imports the written files; the database must be stopped."""
+        parts = ["neo4j-admin database import full", "--overwrite-destination", "--multiline-fields=true",
+                 f"--array-delimiter='{ARRAY_DELIMITER}'"]
+        parts += [f"--nodes={os.path.abspath(path)}" for path in self.node_files]
+        parts += [f"--relationships={os.path.abspath(path)}" for path in self.relationship_files]
+        parts.append(database)
+        return " \\\n    ".join(parts)
@@ -0,0 +1,173 @@
+"""
+Multi-incident batched extraction.
+
+Instead of repeating the instruction block for every incident, several incidents are packed into
+one request and the model answers with a JSON array keyed by filename. plan_batches() chooses how
+many incidents go into each request from a per-request token budget, using the local token
+estimate of each incident's text and the output tokens reserved per incident. Entries missing
+from a batch answer, or that do not parse, are retried one by one with the single-incident prompt.
+Each incident's answer is cached under the key of its single-incident request, so batched and
+single-incident runs reuse each other's answers.
+
+The batch prompt is derived from each script's PROMPT_TEMPLATE, which must contain the
+"Incident Description:" and "Respond strictly in JSON format:" sections.
+"""
+import json
+import asyncio
+from extraction_engine import ChatRequest, ExtractionEngine, estimate_tokens
+from structured_output import split_template, repair_json
+
+ITEM_OVERHEAD_TOKENS = 20  # Filename line and quoting around each incident
+
+
+def build_batch_prompt(instructions, schema, items):
+    """Prompt for a list of (filename, text) items."""
+    incidents = "\n\n".join(f'Incident "{filename}":\n"{text}"' for filename, text in items)
+    return f"""
+{instructions}
+
+Apply these instructions separately to each of the {len(items)} incidents below.
+
+{incidents}
+
+Respond strictly with a JSON array containing one object per incident, in the same order:
+[
+    {{"filename": "<incident filename>", "attributes": {schema}}}
+]
+"""
+
+
+def plan_batches(item_tokens, fixed_tokens, output_tokens_per_item, token_budget, max_batch_size):
+    """
+    Greedily group consecutive items so that instructions + incident texts + reserved output
+    tokens stay within token_budget. Returns lists of item positions; an item too large for the
+    budget on its own still gets a batch of one.
+    """
+    batches = []
+    current = []
+    used = fixed_tokens
+    for pos, tokens in enumerate(item_tokens):
+        cost = tokens + output_tokens_per_item
+        if current and (used + cost > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            used = fixed_tokens
+        current.append(pos)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_response(content, filenames):
+    """Map filename -> attributes dict for the entries of a batch answer that are usable."""
+    try:
+        data = repair_json(content)
+    except ValueError:
+        return {}
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return {}
+    wanted = set(filenames)
+    results = {}
+    for entry in data:
+        if isinstance(entry, dict) and entry.get("filename") in wanted and isinstance(entry.get("attributes"), dict):
+            results[entry["filename"]] = entry["attributes"]
+    return results
+
+
+async def _run_batched(engine, items, build_request, on_result, token_budget, max_batch_size, cache, desc):
+    probe = build_request("")
+    system = "".join(m["content"] for m in probe.messages if m["role"] == "system")
+    instructions, schema = split_template(probe.template)
+    per_item_tokens = probe.max_tokens
+
+    def item_key(text):
+        # The single-incident request's key, so answers survive a different batch composition and are
+        # shared with non-batched runs and the individual retries
+        return build_request(text).cache_key
+
+    def is_usable(content):
+        return engine.validate is None or engine.validate(content)
+
+    settled = {}  # index -> content, or None for entries deferred to the single-incident retry
+    next_index = 0
+
+    def emit():
+        # Hand settled results to the caller in input order
+        nonlocal next_index
+        while next_index in settled:
+            content = settled.pop(next_index)
+            if content is not None:
+                on_result(next_index, content)
+            next_index += 1
+
+    misses = []
+    for i, (_, text) in enumerate(items):
+        key = item_key(text) if cache is not None else None
+        cached = cache.get(key) if key is not None else None
+        if cached is not None and is_usable(cached):
+            settled[i] = cached
+        else:
+            misses.append(i)
+    emit()
+
+    fixed_tokens = estimate_tokens(system) + estimate_tokens(build_batch_prompt(instructions, schema, []))
+    plan = plan_batches([estimate_tokens(items[i][1]) + ITEM_OVERHEAD_TOKENS for i in misses],
+                        fixed_tokens, per_item_tokens, token_budget, max_batch_size)
+    batches = [[misses[pos] for pos in batch] for batch in plan]
+    requests = [
+        ChatRequest(
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": build_batch_prompt(instructions, schema, [items[i] for i in batch])}
+            ],
+            model=probe.model,
+            temperature=probe.temperature,
+            max_tokens=per_item_tokens * len(batch)
+        )
+        for batch in batches
+    ]
+    print(f"{len(items) - len(misses)} incidents cached, {len(misses)} packed into {len(batches)} batched requests.")
+
+    failed = []
+
+    def on_batch(b, content):
+        parsed = parse_batch_response(content, [items[i][0] for i in batches[b]])
+        for i in batches[b]:
+            attributes = parsed.get(items[i][0])
+            if attributes is not None and not is_usable(json.dumps(attributes)):
+                attributes = None
+            if attributes is None:
+                failed.append(i)
+                settled[i] = None
+                continue
+            content_i = json.dumps(attributes, ensure_ascii=False)
+            key = item_key(items[i][1]) if cache is not None else None
+            if key is not None:
+                cache.put(key, content_i)
+            settled[i] = content_i
+        emit()
+
+    await engine.run(requests, on_batch, desc=desc)
+
+    # Split out the entries that did not come back usable and retry them on their own
+    if failed:
+        failed.sort()
+        print(f"Retrying {len(failed)} incidents individually.")
+        retry_requests = [build_request(items[i][1]) for i in failed]
+        await engine.run(retry_requests, lambda k, content: on_result(failed[k], content), desc="Retrying incidents")
+
+
+def run_batched(items, build_request, on_result, token_budget=6000, max_batch_size=10, cache=None,
+                desc="Processing batches", **engine_kwargs):
+    """
+    Batched counterpart of extraction_engine.run_requests.
+
+    items: list of (filename, text); build_request: the script's single-incident request builder.
+    on_result(index, content) receives one incident's JSON attributes (or the single-incident
+    response for retried entries). Batch results arrive in input order; retried entries follow.
+    """
+    engine = ExtractionEngine(cache=cache, **engine_kwargs)
+    asyncio.run(_run_batched(engine, items, build_request, on_result, token_budget, max_batch_size, cache, desc))
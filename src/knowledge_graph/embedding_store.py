@@ -0,0 +1,130 @@
+"""
+Persistent sentence-embedding store shared by 8_kg.py, web/app.py and src/graphRAG/9_graphRAG.py.
+
+Embeddings are kept per model in <root>/<model name>/:
+    meta.json    model name, dimension and storage dtype (float32 or float16)
+    vectors.bin  append-only array of normalized embeddings, one row per text, read through np.memmap
+    index.tsv    append-only "<sha256 of text>\t<row>" lines
+
+Only texts missing from the index are encoded. Vectors are fsync'd before their index lines are
+written, so a crash never leaves an index entry without its vector. Writers take an exclusive lock
+(fcntl, where available), and every reader picks up entries appended by other processes on the
+next lookup. Because the vectors are memory-mapped read-only, several worker processes share one
+physical copy through the page cache.
+"""
+import os
+import re
+import json
+import hashlib
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer only
+    fcntl = None
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, root, model_name, dim=None, dtype="float32"):
+        self.model_name = model_name
+        self.path = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.vectors_path = os.path.join(self.path, "vectors.bin")
+        self.index_path = os.path.join(self.path, "index.tsv")
+        self.lock_path = os.path.join(self.path, "write.lock")
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["model"] != model_name or (dim is not None and meta["dim"] != dim):
+                raise ValueError(f"{self.path} holds {meta['model']} vectors of dimension {meta['dim']}")
+        else:
+            if dim is None:
+                raise ValueError(f"{self.path} is a new store; its dimension must be given")
+            meta = {"model": model_name, "dim": dim, "dtype": np.dtype(dtype).name}
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        self.dim = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])  # The dtype a store was created with wins
+        self.row_bytes = self.dim * self.dtype.itemsize
+
+        self.rows = {}  # text key -> row in vectors.bin
+        self.index_offset = 0
+        self.vectors = np.zeros((0, self.dim), dtype=self.dtype)
+        self.refresh()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def refresh(self):
+        # Read index lines appended since the last refresh (by this or another process) and remap the vectors
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                f.seek(self.index_offset)
+                chunk = f.read()
+            complete = chunk[:chunk.rfind(b"\n") + 1]  # A line still being written is read next time
+            for line in complete.decode("utf-8").splitlines():
+                key, row = line.split("\t")
+                self.rows[key] = int(row)
+            self.index_offset += len(complete)
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        n = size // self.row_bytes
+        if n != len(self.vectors):
+            self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(n, self.dim))
+
+    def get(self, texts):
+        """(float32 matrix with one row per text, positions of the texts not in the store)."""
+        self.refresh()
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        missing = []
+        for position, text in enumerate(texts):
+            row = self.rows.get(text_key(text))
+            if row is None:
+                missing.append(position)
+            else:
+                matrix[position] = self.vectors[row]
+        return matrix, missing
+
+    def add(self, texts, vectors):
+        """Append vectors for texts not stored yet."""
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self.refresh()
+            new = {}
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                if key not in self.rows and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+            start = (os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0) // self.row_bytes
+            with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+                f.seek(start * self.row_bytes)  # Drops a partial row left by a crashed writer
+                f.write(np.asarray(list(new.values()), dtype=self.dtype).tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{key}\t{start + k}\n" for k, key in enumerate(new))
+                f.flush()
+                os.fsync(f.fileno())
+            self.refresh()
+
+    def encode(self, model, texts, batch_size=256):
+        """Normalized embeddings for texts, encoding (and storing) only the ones not seen before."""
+        matrix, missing = self.get(texts)
+        if missing:
+            unique = list(dict.fromkeys(texts[position] for position in missing))
+            vectors = model.encode(unique, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True,
+                                   show_progress_bar=len(unique) > batch_size)
+            self.add(unique, vectors)
+            encoded = dict(zip(unique, vectors))
+            for position in missing:
+                matrix[position] = encoded[texts[position]]
+        return matrix
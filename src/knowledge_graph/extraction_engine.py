@@ -0,0 +1,206 @@
+"""
+Bounded-concurrency async engine for the GPT extraction scripts (7_extract_entity_keyword*).
+
+Requests run through openai.ChatCompletion.acreate with at most `concurrency` in flight, a
+one-minute sliding window for requests and tokens per minute, and retries with exponential
+backoff on 429/5xx and connection errors. Results are handed to the caller in input order.
+
+With a ResponseCache (response_cache.py), requests that carry their prompt template and input
+text are answered from the cache when the same model, template and input were seen before.
+With a `validate` callable, answers it rejects are neither cached nor served from the cache.
+
+The API endpoint follows openai.api_base, so the engine can be pointed at a local mock server
+(see mock_completion_server.py) with OPENAI_API_BASE=http://127.0.0.1:8765/v1.
+"""
+import json
+import time
+import random
+import asyncio
+from collections import deque
+from functools import lru_cache
+import openai
+from tqdm import tqdm
+from response_cache import text_hash
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text):
+    """Local token estimate (tiktoken if installed, otherwise ~4 characters per token)."""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+class ChatRequest:
+    def __init__(self, messages, model="gpt-4", temperature=0, max_tokens=500, template=None, input_text=None):
+        self.messages = messages
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        # Prompt template and the text substituted into it; both are needed for caching
+        self.template = template
+        self.input_text = input_text
+
+    @property
+    def cache_key(self):
+        # (model, template hash, input hash); the template hash covers the system prompt and sampling settings
+        if self.template is None or self.input_text is None:
+            return None
+        system = "".join(m["content"] for m in self.messages if m["role"] == "system")
+        template_hash = text_hash(json.dumps([system, self.template, self.temperature, self.max_tokens]))
+        return self.model, template_hash, text_hash(self.input_text)
+
+    @property
+    def estimated_tokens(self):
+        # The API counts max_tokens against the token-per-minute quota up front
+        return sum(estimate_tokens(m["content"]) for m in self.messages) + self.max_tokens
+
+
+class RateLimiter:
+    """Sliding one-minute window over requests and tokens; None disables a limit."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, window=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self.events = deque()  # (timestamp, tokens)
+        self.tokens_in_window = 0
+        self.lock = asyncio.Lock()
+
+    def _expire(self, now):
+        while self.events and now - self.events[0][0] >= self.window:
+            _, tokens = self.events.popleft()
+            self.tokens_in_window -= tokens
+
+    def _fits(self, tokens):
+        if self.requests_per_minute is not None and len(self.events) >= self.requests_per_minute:
+            return False
+        # A single request larger than the whole budget is let through once the window is empty
+        if self.tokens_per_minute is not None and self.events and self.tokens_in_window + tokens > self.tokens_per_minute:
+            return False
+        return True
+
+    async def acquire(self, tokens):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if self._fits(tokens):
+                    self.events.append((now, tokens))
+                    self.tokens_in_window += tokens
+                    return
+                await asyncio.sleep(self.window - (now - self.events[0][0]))
+
+
+def is_retryable(error):
+    """429, 5xx, timeouts and connection errors are worth retrying; anything else is not."""
+    if getattr(error, "http_status", None) in RETRY_STATUS:
+        return True
+    retryable = tuple(
+        getattr(openai.error, name) for name in
+        ("RateLimitError", "ServiceUnavailableError", "Timeout", "APIConnectionError", "TryAgain")
+        if hasattr(openai.error, name)
+    )
+    return isinstance(error, retryable + (asyncio.TimeoutError,))
+
+
+def retry_after(error):
+    # Seconds suggested by the server's Retry-After header, if any
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ExtractionEngine:
+    def __init__(self, concurrency=8, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=5, backoff_base=1.0, backoff_max=60.0, request_timeout=120, cache=None, validate=None):
+        self.concurrency = concurrency
+        self.cache = cache
+        self.validate = validate  # validate(content) -> bool; only valid answers are cached
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+
+    async def complete(self, request):
+        """Send one chat request, retrying transient failures; returns the message content."""
+        key = request.cache_key if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None and (self.validate is None or self.validate(cached)):
+                return cached
+
+        content = await self._send(request)
+        if key is not None and (self.validate is None or self.validate(content)):
+            self.cache.put(key, content)
+        return content
+
+    async def _send(self, request):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(request.estimated_tokens)
+            try:
+                response = await openai.ChatCompletion.acreate(
+                    model=request.model,
+                    messages=request.messages,
+                    temperature=request.temperature,
+                    max_tokens=request.max_tokens,
+                    request_timeout=self.request_timeout,
+                )
+                return response["choices"][0]["message"]["content"]
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                # Exponential backoff with full jitter, unless the server says how long to wait
+                delay = retry_after(e) or random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                await asyncio.sleep(delay)
+
+    async def run(self, requests, on_result, desc="Processing rows"):
+        """
+        Run all requests and call on_result(index, content) in input order.
+        content is None for requests that still failed after retries.
+        """
+        requests = list(requests)
+        queue = iter(enumerate(requests))
+        finished = {}
+        next_index = 0
+        progress = tqdm(total=len(requests), desc=desc)
+
+        def flush():
+            nonlocal next_index
+            while next_index in finished:
+                on_result(next_index, finished.pop(next_index))
+                next_index += 1
+
+        async def worker():
+            for index, request in queue:
+                try:
+                    content = await self.complete(request)
+                except Exception as e:
+                    print(f"Error: {e}")
+                    content = None
+                finished[index] = content
+                progress.update(1)
+                flush()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+        progress.close()
+
+
+def run_requests(requests, on_result, desc="Processing rows", **engine_kwargs):
+    """Synchronous entry point for the extraction scripts."""
+    engine = ExtractionEngine(**engine_kwargs)
+    asyncio.run(engine.run(requests, on_result, desc=desc))
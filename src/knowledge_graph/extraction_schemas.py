@@ -0,0 +1,243 @@
+"""
+Extraction schemas shared by the 7_extract_entity_keyword scripts.
+
+A schema is one prompt variant: its template, system prompt, output budget, the attribute
+defaults applied to its answers and the JSON file it is written to. The keyword, concise, HSI and
+procedure scripts each run one schema through schema_extraction.run_extraction();
+7_extract_entity_keyword_multi.py runs several of them against every incident in a single request
+and fans the answers out to the per-schema files.
+"""
+from structured_output import split_template
+
+
+class ExtractionSchema:
+    def __init__(self, name, template, system_prompt, max_tokens, defaults, output_json_path):
+        self.name = name
+        self.template = template  # {text} is replaced by the incident description
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.defaults = defaults  # [(attribute, default)] in output order
+        self.output_json_path = output_json_path
+
+    def normalize(self, attributes):
+        # Ensure all attributes are filled with default values if missing
+        return {key: attributes.get(key, default) for key, default in self.defaults}
+
+
+def build_node(row, attributes):
+    """Knowledge-graph node for one LER row, as read by the 8_kg scripts."""
+    node = {
+        "filename": row.get("File Name", ""),
+        "attributes": attributes,
+        "metadata": {
+            "facility": {
+                "name": row.get("Facility Name", "Unknown Facility"),
+                "unit": row.get("Unit", "Unknown Unit")
+            },
+            "event_date": row.get("Event Date", ""),
+            "title": row.get("Title", ""),
+            "clause": row.get("CFR", "None")
+        }
+    }
+    # Filenames of all revisions of this LER (preprocessing/6b_dedup_revisions.py)
+    revisions = row.get("Revisions")
+    if isinstance(revisions, str) and revisions:
+        node["metadata"]["revisions"] = revisions.split(";")
+    return node
+
+
+KEYWORD_TEMPLATE = """
+        You are an expert in extracting structured and concise information. Extract the following attributes as concise and distinct keywords from the provided text. 
+
+        - Task: Provide up to 3 key phrases describing the task.
+        - Event: Provide up to 3 key phrases summarizing what happened.
+        - Cause: Provide up to 3 key phrases stating the main reason for the incident.
+        - Influence: Provide up to 3 key phrases summarizing the key impact or consequence.
+        - Corrective Actions: Provide up to 3 key phrases listing the actions taken.
+        - Similar Events: Provide up to 2 key phrases mentioning any known similar events, or an empty list if none are known.
+
+        Ensure there is no repetition between attributes, and focus on the most important information. Use only key phrases.
+
+        Incident Description:
+        "{text}"
+
+        Respond strictly in JSON format:
+        {{
+            "Task": ["Keyword1", "Keyword2", "Keyword3"],
+            "Event": ["Keyword1", "Keyword2", "Keyword3"],
+            "Cause": ["Keyword1", "Keyword2", "Keyword3"],
+            "Influence": ["Keyword1", "Keyword2", "Keyword3"],
+            "Corrective Actions": ["Keyword1", "Keyword2", "Keyword3"],
+            "Similar Events": ["Keyword1", "Keyword2"]
+        }}
+    """
+KEYWORD_SYSTEM_PROMPT = "You are an expert in extracting structured information from complex texts for efficient graph-based search."
+
+CONCISE_TEMPLATE = """
+        You are an expert in extracting structured and generalized information. Extract the following attributes as **generalized and abstract keywords** from the provided text.
+
+        Definitions:
+        - **Task**: What specific work, activity, or operation was being performed when the incident occurred? Summarize it with **one general keyword**.
+        - **Event**: What happened during the incident? Summarize it with **one abstract and broad keyword**.
+        - **Cause**: What was the primary cause of the incident? Summarize it with **one general keyword**.
+        - **Influence**: What was the key impact or consequence of the incident? Summarize it with **one broad keyword**.
+        - **Corrective Actions**: What corrective actions were taken after the incident? Summarize it with **one generalized keyword**.
+        - **Similar Events**: Are there known similar events? Provide **a general keyword** or leave as an empty list `[]` if no similar events are known.
+
+        Incident Description:
+        "{text}"
+
+        Respond strictly in JSON format:
+        {{
+            "Task": ["GeneralKeyword1"],
+            "Event": ["GeneralKeyword1"],
+            "Cause": ["GeneralKeyword1"],
+            "Influence": ["GeneralKeyword1"],
+            "Corrective Actions": ["GeneralKeyword1"],
+            "Similar Events": []
+        }}
+    """
+CONCISE_SYSTEM_PROMPT = "You are an expert in extracting structured and generalized information from complex texts for efficient pattern detection and risk analysis."
+
+HSI_TEMPLATE = """
+        You are an expert in extracting structured and generalized information. Extract the following attributes as **generalized and abstract keywords** from the provided text.
+
+        Definitions:
+        - **Task**: What specific work, activity, or operation was being performed when the incident occurred? Summarize it with **one general keyword**.
+        - **Event**: What happened during the incident? Summarize it with **one abstract and broad keyword**.
+        - **Cause**: What was the primary cause of the incident? Summarize it with **one general keyword**.
+        - **Influence**: What was the key impact or consequence of the incident? Summarize it with **one broad keyword**.
+        - **Corrective Actions**: What corrective actions were taken after the incident? Summarize it with **one generalized keyword**.
+        - **HSI Issues**: Identify specific issues or challenges related to Human-System Interfaces (HSI) in this incident, e.g., "Ambiguous Interface", "Poor Visualization", "Inadequate Feedback".
+        - **Similar Events**: Are there known similar events? Provide **a general keyword** or leave as an empty list `[]` if no similar events are known.
+
+        Incident Description:
+        "{text}"
+
+        Respond strictly in JSON format:
+        {{
+            "Task": ["GeneralKeyword1"],
+            "Event": ["GeneralKeyword1"],
+            "Cause": ["GeneralKeyword1"],
+            "Influence": ["GeneralKeyword1"],
+            "Corrective Actions": ["GeneralKeyword1"],
+            "HSI Issues": ["Issue1", "Issue2"],
+            "Similar Events": []
+        }}
+    """
+HSI_SYSTEM_PROMPT = "You are an expert in extracting structured and generalized information from complex texts for efficient pattern detection and risk analysis."
+
+PROCEDURE_TEMPLATE = """
+        You are an expert in analyzing nuclear power plant operations, particularly focusing on procedure interactions in Light Water Reactors (LWRs). Your task is to extract structured information regarding **procedure conflicts and insufficiencies** from the provided text.
+
+        Definitions:
+        - **Conflicting Procedures**: Identify the procedures that were involved in the conflict.
+        - **Conflict Areas**: Specify the operational or functional areas where the conflict occurred.
+        - **Conflict Reason**: Identify why the procedures conflicted, such as sequencing issues, resource constraints, or operational inconsistencies.
+        - **Insufficient Procedures**: Identify procedures that were found to be incomplete, unclear, or inadequate.
+        - **Impact**: Describe the consequence of the procedural conflict or insufficiency on plant safety, operations, or efficiency.
+        - **Resolution Actions**: Describe the corrective actions taken to resolve the conflict or address the insufficiency.
+
+        Incident Description:
+        "{text}"
+
+        Respond strictly in JSON format:
+        {{
+            "Conflicting Procedures": ["Procedure1", "Procedure2"],
+            "Conflict Areas": ["GeneralKeyword1"],
+            "Conflict Reason": ["GeneralKeyword1"],
+            "Insufficient Procedures": ["Procedure3"],
+            "Impact": ["GeneralKeyword1"],
+            "Resolution Actions": ["GeneralKeyword1"]
+        }}
+        """
+PROCEDURE_SYSTEM_PROMPT = "You are an expert in extracting structured and generalized information from complex texts for efficient pattern detection and risk analysis."
+
+SCHEMAS = {
+    "keyword": ExtractionSchema(
+        "keyword", KEYWORD_TEMPLATE, KEYWORD_SYSTEM_PROMPT, 500,
+        defaults=[
+            ("Task", "Unknown"),
+            ("Event", "Unknown"),
+            ("Cause", "Unknown"),
+            ("Influence", "Unknown"),
+            ("Corrective Actions", "None"),
+            ("Similar Events", "None")
+        ],
+        output_json_path="../../data/processed/01030941_ler_kg_keyword.json"
+    ),
+    "concise": ExtractionSchema(
+        "concise", CONCISE_TEMPLATE, CONCISE_SYSTEM_PROMPT, 150,
+        defaults=[
+            ("Task", "Unknown"),
+            ("Event", "Unknown"),
+            ("Cause", "Unknown"),
+            ("Influence", "Unknown"),
+            ("Corrective Actions", "None"),
+            ("Similar Events", "None")
+        ],
+        output_json_path="../../data/processed/01030941_ler_kg_keyword_cocise.json"
+    ),
+    "hsi": ExtractionSchema(
+        "hsi", HSI_TEMPLATE, HSI_SYSTEM_PROMPT, 200,
+        defaults=[
+            ("Task", ["Unknown"]),
+            ("Event", ["Unknown"]),
+            ("Cause", ["Unknown"]),
+            ("Influence", ["Unknown"]),
+            ("Corrective Actions", ["None"]),
+            ("HSI Issues", []),
+            ("Similar Events", [])
+        ],
+        output_json_path="../../data/processed/01030941_ler_kg_hsi_keywords.json"
+    ),
+    "procedure": ExtractionSchema(
+        "procedure", PROCEDURE_TEMPLATE, PROCEDURE_SYSTEM_PROMPT, 200,
+        defaults=[
+            ("Conflicting Procedures", []),
+            ("Insufficient Procedures", []),
+            ("Task", ["Unknown"]),
+            ("Conflict Reason", ["Unknown"]),
+            ("Impact", ["Unknown"]),
+            ("Resolution Actions", ["None"]),
+            ("Incident Description", "No description provided")
+        ],
+        output_json_path="../../data/processed/0120_kg_procedure.json"
+    ),
+}
+
+MULTI_SYSTEM_PROMPT = "You are an expert in extracting structured information from nuclear incident reports. You answer several independent extraction tasks about the same incident at once."
+
+
+def _escape(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def build_multi_template(schemas):
+    """
+    Template asking for every schema in one answer, keyed by schema name. It keeps the
+    "Incident Description:" / "Respond strictly in JSON format:" layout, so batch_planner can batch it too.
+    """
+    sections = []
+    formats = []
+    for schema in schemas:
+        instructions, response_format = split_template(schema.template)
+        sections.append(f'Task "{schema.name}":\n{_escape(instructions)}')
+        formats.append(f'"{schema.name}": {_escape(response_format)}')
+    return (
+        f"\nAnswer the following {len(schemas)} independent tasks for the incident below. "
+        "Treat each task on its own; do not share keywords between tasks. "
+        "Answer with one JSON object holding one key per task name.\n\n"
+        + "\n\n".join(sections)
+        + '\n\nIncident Description:\n"{text}"\n\n'
+        + "Respond strictly in JSON format:\n{{\n"
+        + ",\n".join(formats)
+        + "\n}}\n"
+    )
+
+
+def split_multi_response(answer, schemas):
+    """Map schema name -> attributes dict for the parts of a parsed combined answer that are usable."""
+    if not isinstance(answer, dict):
+        return {}
+    return {schema.name: answer[schema.name] for schema in schemas if isinstance(answer.get(schema.name), dict)}
@@ -0,0 +1,369 @@
+"""
+UNWIND-batched bulk loading for the 8_kg scripts.
+
+Instead of one transaction per incident with one tx.run per keyword, the rows of each statement
+(incidents, keyword nodes and their relationships, facilities, CFR clauses, similarity edges) are
+sent as parameter lists of `batch_size` rows, one transaction per batch:
+
+    UNWIND $rows AS row
+    MERGE (n:Task {description: row.description}) ...
+
+The number of round trips then depends on the number of batches, not rows. BulkLoader prints
+rows/sec per statement. RecordingDriver is a stand-in for neo4j's driver that only records the
+statements and parameters it receives, so a load can be checked (or dry-run) without a database:
+
+    driver = RecordingDriver()
+    BulkLoader(driver, batch_size=500).load("incidents", INCIDENT_QUERY, incident_rows(data))
+    driver.calls  # [(query, {"rows": [...]}), ...]
+
+ParallelLoader spreads the batches over several worker sessions. Because almost every incident
+links to the same few keyword nodes, it loads in two phases: first all distinct keyword and
+facility nodes (CFR nodes come from CFR_NODE_QUERY beforehand), then the incidents and their
+relationships, partitioned by incident across the workers. Phase two only MATCHes the shared nodes,
+rows are sorted so workers lock them in the same order, and batches that still hit a deadlock or
+another transient error are retried with backoff.
+"""
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+INCIDENT_QUERY = """
+UNWIND $rows AS row
+MERGE (i:Incident {filename: row.filename})
+SET i += row.properties
+"""
+
+FACILITY_QUERY = """
+UNWIND $rows AS row
+MERGE (f:Facility {name: row.name, unit: row.unit})
+MERGE (i:Incident {filename: row.filename})
+MERGE (i)-[:OCCURRED_AT]->(f)
+"""
+
+CFR_NODE_QUERY = """
+UNWIND $rows AS row
+MERGE (c:CFR {cfr: row.cfr})
+SET c.upper = row.upper, c.lower = row.lower
+"""
+
+CLAUSE_QUERY = """
+UNWIND $rows AS row
+MERGE (cl:CFR {cfr: row.cfr})
+SET cl.upper = row.upper, cl.lower = row.lower
+MERGE (i:Incident {filename: row.filename})
+MERGE (i)-[:REGULATED_BY]->(cl)
+"""
+
+
+def keyword_query(label, relationship):
+    """Keyword nodes (Task, Cause, ...) and the Incident relationships pointing at them."""
+    return f"""
+UNWIND $rows AS row
+MERGE (n:{label} {{description: row.description}})
+MERGE (i:Incident {{filename: row.filename}})
+MERGE (i)-[:{relationship}]->(n)
+"""
+
+
+def similarity_query(relationship, label, key1, key2):
+    """Similarity edges between two incidents via their keyword nodes; the rest of the row becomes edge properties."""
+    return f"""
+UNWIND $rows AS row
+MATCH (e1:Incident {{filename: row.filename1}}), (e2:Incident {{filename: row.filename2}}),
+      (k1:{label} {{description: row.{key1}}}), (k2:{label} {{description: row.{key2}}})
+MERGE (e1)-[r:{relationship}]->(e2)
+SET r += row.properties
+"""
+
+
+FACILITY_NODE_QUERY = """
+UNWIND $rows AS row
+MERGE (f:Facility {name: row.name, unit: row.unit})
+"""
+
+FACILITY_LINK_QUERY = """
+UNWIND $rows AS row
+MATCH (i:Incident {filename: row.filename})
+MATCH (f:Facility {name: row.name, unit: row.unit})
+MERGE (i)-[:OCCURRED_AT]->(f)
+"""
+
+CLAUSE_LINK_QUERY = """
+UNWIND $rows AS row
+MATCH (i:Incident {filename: row.filename})
+MATCH (cl:CFR {cfr: row.cfr})
+MERGE (i)-[:REGULATED_BY]->(cl)
+"""
+
+
+def keyword_node_query(label):
+    return f"""
+UNWIND $rows AS row
+MERGE (n:{label} {{description: row.description}})
+"""
+
+
+def keyword_link_query(label, relationship):
+    """Relationships to keyword nodes that already exist (phase two of ParallelLoader)."""
+    return f"""
+UNWIND $rows AS row
+MATCH (i:Incident {{filename: row.filename}})
+MATCH (n:{label} {{description: row.description}})
+MERGE (i)-[:{relationship}]->(n)
+"""
+
+
+def incident_rows(data, properties):
+    """properties(event) -> dict of Incident properties."""
+    for event in data:
+        yield {"filename": event["filename"], "properties": properties(event)}
+
+
+def keyword_rows(data, attribute):
+    for event in data:
+        for item in event["attributes"].get(attribute, []):
+            yield {"filename": event["filename"], "description": item}
+
+
+def facility_rows(data):
+    for event in data:
+        facility = event["metadata"]["facility"]
+        yield {"filename": event["filename"], "name": facility["name"], "unit": facility["unit"]}
+
+
+def cfr_rows(cfr_dict):
+    for cfr, values in cfr_dict.items():
+        yield {"cfr": cfr, "upper": values["content_3"], "lower": values["content_4"]}
+
+
+def clause_rows(data, cfr_dict):
+    # Only clauses with a CFR description are linked
+    for event in data:
+        clause_text = event["metadata"].get("clause", "")
+        for clause in (clause_text if isinstance(clause_text, str) else "").split(", "):
+            if clause in cfr_dict:
+                yield {"filename": event["filename"], "cfr": clause,
+                       "upper": cfr_dict[clause]["content_3"], "lower": cfr_dict[clause]["content_4"]}
+
+
+def facility_key(row):
+    # repr keeps unit 1 and unit "1" apart, as MERGE does
+    return repr(row["name"]), repr(row["unit"])
+
+
+def distinct_rows(rows, key):
+    """One row per key, sorted by it."""
+    unique = {}
+    for row in rows:
+        unique.setdefault(key(row), row)
+    return [unique[k] for k in sorted(unique)]
+
+
+def _run_batch(tx, query, rows):
+    tx.run(query, rows=rows)
+
+
+class BulkLoader:
+    def __init__(self, driver, batch_size=1000, database=None):
+        self.driver = driver
+        self.batch_size = batch_size
+        self.database = database
+        self.stats = []  # (name, rows, batches, seconds)
+
+    def load(self, name, query, rows):
+        """Send rows (any iterable) through query in batches of batch_size; returns the number of rows."""
+        rows = iter(rows)
+        count = 0
+        batches = 0
+        started = time.perf_counter()
+        session_options = {"database": self.database} if self.database else {}
+        with self.driver.session(**session_options) as session:
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                session.write_transaction(_run_batch, query, batch)
+                count += len(batch)
+                batches += 1
+        seconds = time.perf_counter() - started
+        self.stats.append((name, count, batches, seconds))
+        print(f"{name}: {count} rows in {batches} batches, {count / seconds if seconds else 0:.0f} rows/sec")
+        return count
+
+    def load_events(self, data, cfr_dict, keyword_attributes, incident_properties):
+        """
+        Incidents, their keyword nodes, facilities and CFR clauses.
+        keyword_attributes: [(attribute, node label, relationship type)].
+        """
+        self.load("Incident", INCIDENT_QUERY, incident_rows(data, incident_properties))
+        for attribute, label, relationship in keyword_attributes:
+            self.load(f"{label} / {relationship}", keyword_query(label, relationship), keyword_rows(data, attribute))
+        self.load("Facility / OCCURRED_AT", FACILITY_QUERY, facility_rows(data))
+        self.load("CFR / REGULATED_BY", CLAUSE_QUERY, clause_rows(data, cfr_dict))
+
+    def report(self):
+        rows = sum(s[1] for s in self.stats)
+        batches = sum(s[2] for s in self.stats)
+        seconds = sum(s[3] for s in self.stats)
+        print(f"Loaded {rows} rows in {batches} batches in {seconds:.1f}s ({rows / seconds if seconds else 0:.0f} rows/sec).")
+
+
+def is_retryable(error):
+    """Deadlocks, lock timeouts and other Neo.TransientError failures are worth retrying."""
+    code = getattr(error, "code", None) or ""
+    return code.startswith("Neo.TransientError") or type(error).__name__ in ("TransientError", "ServiceUnavailable")
+
+
+class ParallelLoader(BulkLoader):
+    def __init__(self, driver, batch_size=1000, database=None, workers=4, max_retries=5,
+                 backoff_base=0.1, backoff_max=5.0):
+        super().__init__(driver, batch_size, database)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock = threading.Lock()
+        self.retries = 0
+
+    def _session(self):
+        return self.driver.session(**({"database": self.database} if self.database else {}))
+
+    def _write(self, session, query, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return session.write_transaction(_run_batch, query, batch)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                with self.lock:
+                    self.retries += 1
+                # Exponential backoff with full jitter, so colliding workers do not retry in lockstep
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    def load(self, name, query, rows):
+        """Like BulkLoader.load, with the batches shared among the worker sessions."""
+        rows = iter(rows)
+        count = 0
+        batches = 0
+        started = time.perf_counter()
+
+        def worker():
+            nonlocal count, batches
+            with self._session() as session:
+                while True:
+                    with self.lock:
+                        batch = list(islice(rows, self.batch_size))
+                    if not batch:
+                        return
+                    self._write(session, query, batch)
+                    with self.lock:
+                        count += len(batch)
+                        batches += 1
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(worker) for _ in range(self.workers)]:
+                future.result()
+        seconds = time.perf_counter() - started
+        self.stats.append((name, count, batches, seconds))
+        print(f"{name}: {count} rows in {batches} batches on {self.workers} workers, "
+              f"{count / seconds if seconds else 0:.0f} rows/sec")
+        return count
+
+    def _load_partition(self, statements):
+        # statements: [(query, rows)] of one worker's incidents, written in order
+        count = 0
+        batches = 0
+        with self._session() as session:
+            for query, rows in statements:
+                rows = iter(rows)
+                while True:
+                    batch = list(islice(rows, self.batch_size))
+                    if not batch:
+                        break
+                    self._write(session, query, batch)
+                    count += len(batch)
+                    batches += 1
+        return count, batches
+
+    def load_events(self, data, cfr_dict, keyword_attributes, incident_properties):
+        """
+        Phase one: every distinct keyword and facility node. Phase two: incidents and their
+        relationships, one partition of the incidents per worker. CFR nodes must exist already.
+        """
+        for attribute, label, relationship in keyword_attributes:
+            self.load(label, keyword_node_query(label),
+                      distinct_rows(keyword_rows(data, attribute), key=lambda row: row["description"]))
+        self.load("Facility", FACILITY_NODE_QUERY,
+                  distinct_rows(facility_rows(data), key=facility_key))
+
+        def statements(partition):
+            # Sorted by the shared node, so all workers lock keyword nodes in the same order
+            result = [(INCIDENT_QUERY, incident_rows(partition, incident_properties))]
+            for attribute, label, relationship in keyword_attributes:
+                rows = sorted(keyword_rows(partition, attribute), key=lambda row: row["description"])
+                result.append((keyword_link_query(label, relationship), rows))
+            result.append((FACILITY_LINK_QUERY, sorted(facility_rows(partition), key=facility_key)))
+            result.append((CLAUSE_LINK_QUERY, sorted(clause_rows(partition, cfr_dict), key=lambda row: row["cfr"])))
+            return result
+
+        started = time.perf_counter()
+        partitions = [data[k::self.workers] for k in range(self.workers)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = [future.result() for future in
+                       [executor.submit(self._load_partition, statements(partition)) for partition in partitions]]
+        seconds = time.perf_counter() - started
+        count = sum(r[0] for r in results)
+        batches = sum(r[1] for r in results)
+        self.stats.append(("Incident relationships", count, batches, seconds))
+        print(f"Incident relationships: {count} rows in {batches} batches on {self.workers} workers, "
+              f"{count / seconds if seconds else 0:.0f} rows/sec")
+
+    def report(self):
+        super().report()
+        print(f"{self.retries} batches retried after deadlocks or transient errors.")
+
+
+class RecordingTransaction:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def run(self, query, parameters=None, **kwargs):
+        self.calls.append((query, dict(parameters or {}, **kwargs)))
+        return []  # Reads return no records
+
+
+class RecordingSession:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None, **kwargs):
+        self.calls.append((query, dict(parameters or {}, **kwargs)))
+        return []
+
+    def write_transaction(self, work, *args, **kwargs):
+        return work(RecordingTransaction(self.calls), *args, **kwargs)
+
+    execute_write = write_transaction
+    read_transaction = write_transaction
+    execute_read = write_transaction
+
+
+class RecordingDriver:
+    """Stand-in for neo4j.GraphDatabase.driver(...) that records (query, parameters) instead of sending them."""
+
+    def __init__(self):
+        self.calls = []
+
+    def session(self, **kwargs):
+        return RecordingSession(self.calls)
+
+    def close(self):
+        pass
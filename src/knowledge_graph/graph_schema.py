@@ -0,0 +1,162 @@
+"""
+Constraints, indexes and query-plan checks for the knowledge-graph loaders.
+
+Without them every `MERGE (i:Incident {filename: ...})` or `MATCH (t:Task {description: ...})`
+scans all nodes of the label, so a load slows down quadratically with the corpus. apply_schema()
+creates a uniqueness constraint (which comes with an index) for each node key the loaders use, and
+a lookup index for Facility(name, unit). Every statement uses IF NOT EXISTS, so it can run before
+each load. verify_plans() runs EXPLAIN on the loaders' hot queries and raises if any of them still
+starts from a label or all-nodes scan.
+
+`graph` is anything with .run(query, **parameters): a neo4j session or a py2neo Graph.
+Needs Neo4j 4.4 or later for the CREATE ... IF NOT EXISTS / REQUIRE syntax.
+
+    python graph_schema.py   # apply and verify on the default database
+"""
+from collections.abc import Mapping
+
+from graph_loader import (INCIDENT_QUERY, FACILITY_QUERY, CFR_NODE_QUERY, CLAUSE_QUERY, FACILITY_NODE_QUERY,
+                          FACILITY_LINK_QUERY, CLAUSE_LINK_QUERY, keyword_query, keyword_node_query,
+                          keyword_link_query, similarity_query)
+from graph_sync import DETACH_INCIDENT_QUERY, DELETE_INCIDENT_QUERY
+
+# (label, key property): one node per key, as the MERGEs assume
+UNIQUE_KEYS = [
+    ("Incident", "filename"),
+    ("Task", "description"),
+    ("Event", "description"),
+    ("Cause", "description"),
+    ("Influence", "description"),
+    ("CorrectiveActions", "description"),  # 8_kg*.py
+    ("CorrectiveAction", "description"),  # human_error/2_new_kg.py
+    ("HSIIssue", "description"),
+    ("CFR", "cfr"),
+]
+
+# (label, properties): composite lookups that are not unique keys
+LOOKUP_INDEXES = [
+    ("Facility", ("name", "unit")),
+]
+
+# Operators that read every node of a label (or of the graph) instead of seeking an index
+SCAN_OPERATORS = {"NodeByLabelScan", "AllNodesScan"}
+
+# Keyword attributes of 8_kg*.py: (node label, relationship from the Incident)
+KEYWORD_RELATIONSHIPS = [("Task", "RELATED_TO_TASK"),
+                         ("HSIIssue", "HAS_HSI_ISSUE"),
+                         ("Event", "HAS_EVENT"),
+                         ("Cause", "HAS_CAUSE"),
+                         ("Influence", "HAS_INFLUENCE"),
+                         ("CorrectiveActions", "HAS_CORRECTIVE_ACTIONS")]
+
+
+def schema_statements():
+    """(name, statement) for every constraint and index."""
+    for label, key in UNIQUE_KEYS:
+        name = f"{label.lower()}_{key}_unique"
+        yield name, f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{key} IS UNIQUE"
+    for label, properties in LOOKUP_INDEXES:
+        name = f"{label.lower()}_{'_'.join(properties)}_index"
+        columns = ", ".join(f"n.{prop}" for prop in properties)
+        yield name, f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON ({columns})"
+
+
+def apply_schema(graph):
+    """Create missing constraints and indexes and wait until they are online."""
+    for name, statement in schema_statements():
+        try:
+            result = graph.run(statement)
+            if hasattr(result, "consume"):
+                result.consume()  # The neo4j driver only reports errors once the result is consumed
+        except Exception as e:
+            # Usually duplicate keys left by a load without constraints
+            raise RuntimeError(f"Could not create {name}: {e}") from e
+    graph.run("CALL db.awaitIndexes(300)")
+    print(f"Schema applied: {len(UNIQUE_KEYS)} constraints, {len(LOOKUP_INDEXES)} indexes.")
+
+
+def loader_queries():
+    """name -> query for the UNWIND statements of graph_loader.py and graph_sync.py."""
+    queries = {
+        "Incident": INCIDENT_QUERY,
+        "Facility / OCCURRED_AT": FACILITY_QUERY,
+        "CFR": CFR_NODE_QUERY,
+        "CFR / REGULATED_BY": CLAUSE_QUERY,
+        "SIMILAR_TASK": similarity_query("SIMILAR_TASK", "Task", "task1", "task2"),
+        "SIMILAR_HSI": similarity_query("SIMILAR_HSI", "HSIIssue", "hsi1", "hsi2"),
+        "Facility (parallel)": FACILITY_NODE_QUERY,
+        "OCCURRED_AT (parallel)": FACILITY_LINK_QUERY,
+        "REGULATED_BY (parallel)": CLAUSE_LINK_QUERY,
+        "Detach incident": DETACH_INCIDENT_QUERY,
+        "Delete incident": DELETE_INCIDENT_QUERY,
+    }
+    for label, relationship in KEYWORD_RELATIONSHIPS:
+        queries[f"{label} / {relationship}"] = keyword_query(label, relationship)
+        queries[f"{label} (parallel)"] = keyword_node_query(label)
+        queries[f"{relationship} (parallel)"] = keyword_link_query(label, relationship)
+    return queries
+
+
+def human_error_queries():
+    """name -> the MERGE that py2neo's graph.merge(node, label, key) runs in human_error/2_new_kg.py."""
+    queries = {"Incident": "MERGE (n:Incident {filename: $key})"}
+    for label in ["Task", "Cause", "Event", "Influence", "CorrectiveAction"]:
+        queries[label] = f"MERGE (n:{label} {{description: $key}})"
+    return queries
+
+
+def _plan(result):
+    # neo4j driver: the plan dict of the result summary; py2neo: the cursor's plan
+    if hasattr(result, "consume"):
+        return result.consume().plan
+    return result.plan()
+
+
+def plan_operators(plan):
+    """Operator names of an EXPLAIN plan (neo4j dict or py2neo object), without the "@neo4j" suffix."""
+    if plan is None:
+        return []
+    if isinstance(plan, Mapping):
+        operator = plan.get("operatorType", plan.get("operator_type", ""))
+        children = plan.get("children", [])
+    else:
+        operator, children = getattr(plan, "operator_type", ""), getattr(plan, "children", [])
+    operators = [operator.split("@")[0]]
+    for child in children:
+        operators += plan_operators(child)
+    return operators
+
+
+def verify_plans(graph, queries, parameters=None):
+    """
+    EXPLAIN every query (nothing is executed) and raise RuntimeError listing those whose plan
+    contains a label or all-nodes scan. Returns {name: operators}.
+    """
+    parameters = parameters if parameters is not None else {"rows": [], "key": ""}
+    plans = {}
+    scans = []
+    for name, query in queries.items():
+        operators = plan_operators(_plan(graph.run("EXPLAIN " + query, **parameters)))
+        plans[name] = operators
+        found = sorted(SCAN_OPERATORS.intersection(operators))
+        if found:
+            scans.append(f"{name}: {', '.join(found)}")
+    if scans:
+        raise RuntimeError("Queries fall back to full scans (is the schema applied?):\n  " + "\n  ".join(scans))
+    print(f"Query plans verified: {len(plans)} queries use index seeks.")
+    return plans
+
+
+if __name__ == "__main__":
+    from neo4j import GraphDatabase
+
+    # Neo4j connection settings
+    uri = "bolt://localhost:7687"
+    username = "neo4j"
+    password = "tkfkd7274"
+
+    driver = GraphDatabase.driver(uri, auth=(username, password))
+    with driver.session() as session:
+        apply_schema(session)
+        verify_plans(session, loader_queries())
+    driver.close()
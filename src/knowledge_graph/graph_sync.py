@@ -0,0 +1,94 @@
+"""
+Incremental updates of the knowledge graph instead of delete-all-and-rebuild.
+
+Every Incident carries a content_hash of its extraction record (attributes and metadata). A run
+with INCREMENTAL = True reads the filename -> content_hash pairs already in the graph and sorts
+the extraction records into
+
+    new        filename not in the graph
+    changed    filename in the graph with another hash (or none, i.e. loaded before hashes)
+    unchanged  same hash; not touched
+    superseded older revisions of an LER whose latest revision is in the extraction
+
+Changed incidents lose all their relationships (keyword links, facility, clauses and similarity
+edges) before they are loaded again, and keyword or facility nodes left without relationships are
+removed; superseded incidents are deleted. Similarity is then computed only for pairs with at least
+one new or changed incident (similarity_engine.cross_pairs), so adding a month of LERs costs about
+as much as that month. Incidents in the graph but not in the extraction are left as they are.
+"""
+import json
+import hashlib
+
+EXISTING_INCIDENTS_QUERY = """
+MATCH (i:Incident)
+RETURN i.filename AS filename, i.content_hash AS content_hash
+"""
+
+# Keyword and facility nodes that only the detached incidents pointed to are deleted; CFR nodes stay
+DETACH_INCIDENT_QUERY = """
+UNWIND $rows AS row
+MATCH (i:Incident {filename: row.filename})-[r]-(n)
+DELETE r
+WITH DISTINCT n
+WHERE NOT n:Incident AND NOT n:CFR AND NOT EXISTS { (n)--() }
+DELETE n
+"""
+
+DELETE_INCIDENT_QUERY = """
+UNWIND $rows AS row
+MATCH (i:Incident {filename: row.filename})
+DETACH DELETE i
+"""
+
+
+def content_hash(event):
+    """Hash of everything the loaders write for an incident."""
+    content = json.dumps({"attributes": event["attributes"], "metadata": event["metadata"]},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def incident_properties(event):
+    """Properties the loaders set on the Incident node, shared by the 8_kg scripts."""
+    return {
+        "title": event["metadata"]["title"],
+        "date": event["metadata"]["event_date"],
+        # Filenames of all revisions of the LER (preprocessing/6b_dedup_revisions.py)
+        "revisions": event["metadata"].get("revisions", [event["filename"]]),
+        "content_hash": content_hash(event)  # Lets an INCREMENTAL run skip unchanged incidents
+    }
+
+
+def existing_hashes(driver, database=None):
+    """filename -> content_hash (None when loaded without one) of the incidents in the graph."""
+    session_options = {"database": database} if database else {}
+    with driver.session(**session_options) as session:
+        return {record["filename"]: record["content_hash"] for record in session.run(EXISTING_INCIDENTS_QUERY)}
+
+
+def plan_upsert(data, existing):
+    """
+    Sort data against existing (filename -> content_hash). Returns a dict of lists: "new",
+    "changed" and "unchanged" hold positions in data, "superseded" holds filenames.
+    """
+    plan = {"new": [], "changed": [], "unchanged": [], "superseded": []}
+    current = set()
+    for position, event in enumerate(data):
+        filename = event["filename"]
+        current.add(filename)
+        if filename not in existing:
+            plan["new"].append(position)
+        elif existing[filename] != content_hash(event):
+            plan["changed"].append(position)
+        else:
+            plan["unchanged"].append(position)
+    for event in data:
+        for revision in event["metadata"].get("revisions", []):
+            if revision in existing and revision not in current and revision not in plan["superseded"]:
+                plan["superseded"].append(revision)
+    return plan
+
+
+def filename_rows(filenames):
+    for filename in filenames:
+        yield {"filename": filename}
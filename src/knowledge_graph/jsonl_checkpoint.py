@@ -0,0 +1,112 @@
+"""
+Crash-safe JSONL output for the extraction scripts.
+
+Nodes are appended one per line and fsync'd every `fsync_every` records, so a crash loses at most
+the last few nodes instead of the whole run. On restart, the filenames already in the JSONL file
+are skipped. compact() then turns the JSONL file into the JSON array 8_kg.py reads.
+"""
+import os
+import json
+import textwrap
+
+
+def repair_tail(path):
+    # Drop a partially written last line left behind by a crash
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the previous newline and cut everything after it
+        pos = size - 1
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            idx = chunk.rfind(b"\n")
+            if idx != -1:
+                pos = pos - step + idx + 1
+                break
+            pos -= step
+        f.truncate(pos)
+
+
+def read_jsonl(path):
+    """Yield the records of a JSONL file, skipping lines that do not parse."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"Skipping unreadable line {line_no} in {path}")
+
+
+def completed_filenames(path):
+    """Filenames already written to the JSONL file."""
+    return {record.get("filename") for record in read_jsonl(path)}
+
+
+class JsonlWriter:
+    def __init__(self, path, fsync_every=20, resume=True):
+        self.path = path
+        self.fsync_every = fsync_every
+        if resume:
+            repair_tail(path)
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+        self.pending = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.pending += 1
+        if self.pending >= self.fsync_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.checkpoint()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compact(jsonl_path, json_path):
+    """
+    Write the JSONL records as a JSON array, formatted like json.dump(records, indent=4).
+    If a filename occurs more than once, its last record wins. Records are streamed, not held in memory.
+    """
+    last_line = {}
+    for i, record in enumerate(read_jsonl(jsonl_path)):
+        last_line[record.get("filename")] = i
+    keep = set(last_line.values())
+
+    tmp_path = json_path + ".tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write("[")
+        for i, record in enumerate(read_jsonl(jsonl_path)):
+            if i not in keep:
+                continue
+            out.write(",\n" if count else "\n")
+            out.write(textwrap.indent(json.dumps(record, indent=4, ensure_ascii=False), "    "))
+            count += 1
+        out.write("\n]" if count else "]")
+    os.replace(tmp_path, json_path)
+    return count
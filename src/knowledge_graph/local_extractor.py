@@ -0,0 +1,162 @@
+"""
+Offline keyword extraction with spaCy, as a fast alternative to the GPT extraction scripts.
+
+Incident texts are parsed in batches and reduced to lemma and noun-chunk features. Sentences with
+an attribute cue ("due to", "corrective action", ...) count extra for that attribute. Keywords
+are then mapped onto the vocabulary of an existing GPT extraction: every keyword gets the TF-IDF
+centroid of the incidents GPT labelled with it, and an incident receives the keywords whose
+centroids are closest; the centroids are kept as a feature -> (keyword, weight) index, so scoring an
+incident only touches the features it shares with them. An attribute with no close keyword falls back to the most frequent noun
+chunk of its cue sentences. The best cosine similarity is the attribute's confidence.
+"""
+import re
+import math
+from collections import Counter, defaultdict
+import numpy as np
+
+ATTRIBUTES = ["Task", "Event", "Cause", "Influence", "Corrective Actions"]
+
+# Sentences matching an attribute's cue weigh CUE_WEIGHT times more for that attribute
+ATTRIBUTE_CUES = {
+    "Task": r"\b(?:during|while|performing|being performed|in progress|surveillance|testing|maintenance|startup|refuel\w*)\b",
+    "Event": r"\b(?:occurred|trip(?:ped)?|actuat\w*|fail(?:ed|ure)|inoperable|declared|discovered|identified)\b",
+    "Cause": r"\b(?:caus\w*|due to|attributed|result of|because|contribut\w*)\b",
+    "Influence": r"\b(?:result(?:ed|ing)? in|consequence|impact|safety significance|loss of|led to)\b",
+    "Corrective Actions": r"\b(?:corrective|replac\w*|revis\w*|repair\w*|implement\w*|restored|planned|will be)\b",
+}
+CUE_PATTERNS = {attribute: re.compile(cue, re.IGNORECASE) for attribute, cue in ATTRIBUTE_CUES.items()}
+CUE_WEIGHT = 2.0
+CONTENT_POS = {"NOUN", "PROPN", "VERB", "ADJ"}
+MAX_CHUNK_WORDS = 3
+NO_VALUE = {"", "unknown", "none", "n/a"}  # Defaults filled in by the GPT scripts, not real keywords
+
+
+def chunk_phrase(chunk):
+    # Lemmatized noun chunk without determiners and stop words, keeping the words nearest the head
+    words = [t.lemma_.lower() for t in chunk if t.is_alpha and not t.is_stop and t.pos_ != "PRON"]
+    return " ".join(words[-MAX_CHUNK_WORDS:])
+
+
+def doc_features(doc):
+    """
+    Reduce a parsed incident to plain counters (cheap to keep for a whole corpus):
+    {"general": lemma/chunk counts, "cued": {attribute: counts}, "chunks": {attribute: noun chunk counts}}
+    """
+    general = Counter()
+    cued = {attribute: Counter() for attribute in ATTRIBUTES}
+    chunks = {attribute: Counter() for attribute in ATTRIBUTES}
+    for sent in doc.sents:
+        features = Counter(
+            t.lemma_.lower() for t in sent
+            if t.is_alpha and not t.is_stop and t.pos_ in CONTENT_POS and len(t) > 2
+        )
+        phrases = [p for p in (chunk_phrase(c) for c in sent.noun_chunks) if p]
+        features.update("np:" + p for p in phrases)
+        general.update(features)
+        for attribute, pattern in CUE_PATTERNS.items():
+            if pattern.search(sent.text):
+                cued[attribute].update(features)
+                chunks[attribute].update(phrases)
+    return {"general": general, "cued": cued, "chunks": chunks}
+
+
+def _as_list(value):
+    if isinstance(value, list):
+        return [v for v in value if isinstance(v, str)]
+    return [value] if isinstance(value, str) else []
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(w * w for w in vector.values()))
+    return {f: w / norm for f, w in vector.items()} if norm else {}
+
+
+def _postings(centroids):
+    # feature -> (keyword positions, weights) over the normalized centroid vectors
+    positions = defaultdict(list)
+    weights = defaultdict(list)
+    for k, centroid in enumerate(centroids):
+        for f, w in centroid.items():
+            positions[f].append(k)
+            weights[f].append(w)
+    return {f: (np.array(positions[f], dtype=np.int64), np.array(weights[f])) for f in positions}
+
+
+class KeywordMapper:
+    """Per-attribute TF-IDF keyword centroids learned from an existing (GPT) extraction."""
+
+    def __init__(self, min_keyword_count=2, secondary_ratio=0.8):
+        self.min_keyword_count = min_keyword_count  # Keywords seen less often are not learned
+        self.secondary_ratio = secondary_ratio  # Extra keywords must score this share of the best one
+        self.idf = {}
+        self.default_idf = 1.0  # IDF of features never seen in fit (the largest one)
+        self.centroids = {attribute: {} for attribute in ATTRIBUTES}  # attribute -> keyword -> vector
+        self.keywords = {attribute: [] for attribute in ATTRIBUTES}  # attribute -> keywords in index order
+        self.postings = {attribute: {} for attribute in ATTRIBUTES}  # attribute -> _postings() of the centroids
+
+    def vector(self, features, attribute):
+        counts = Counter(features["general"])
+        for f, n in features["cued"][attribute].items():
+            counts[f] += CUE_WEIGHT * n
+        return _normalize({f: (1 + math.log(n)) * self.idf.get(f, self.default_idf) for f, n in counts.items()})
+
+    def fit(self, features_by_file, labelled_nodes):
+        """features_by_file: filename -> doc_features(); labelled_nodes: records of a GPT extraction JSON."""
+        document_frequency = Counter()
+        for features in features_by_file.values():
+            document_frequency.update(features["general"].keys())
+        n_docs = len(features_by_file)
+        self.idf = {f: math.log((1 + n_docs) / (1 + df)) + 1 for f, df in document_frequency.items()}
+        self.default_idf = max(self.idf.values(), default=1.0)
+
+        for attribute in ATTRIBUTES:
+            sums = defaultdict(Counter)
+            counts = Counter()
+            spellings = defaultdict(Counter)  # Most common spelling of each case-folded keyword
+            for node in labelled_nodes:
+                features = features_by_file.get(node.get("filename"))
+                if features is None:
+                    continue
+                keywords = {k.strip().lower(): k.strip() for k in _as_list(node.get("attributes", {}).get(attribute))}
+                keywords = {key: k for key, k in keywords.items() if key not in NO_VALUE}
+                if not keywords:
+                    continue
+                vector = self.vector(features, attribute)
+                for key, spelling in keywords.items():
+                    sums[key].update(vector)
+                    counts[key] += 1
+                    spellings[key][spelling] += 1
+            self.centroids[attribute] = {
+                spellings[key].most_common(1)[0][0]: _normalize(sums[key])
+                for key, n in counts.items() if n >= self.min_keyword_count
+            }
+            self.keywords[attribute] = list(self.centroids[attribute])
+            self.postings[attribute] = _postings(self.centroids[attribute].values())
+        return self
+
+    def vocabulary_size(self, attribute):
+        return len(self.centroids[attribute])
+
+    def predict(self, features, attribute, max_keywords=3, min_similarity=0.1):
+        """(keywords, confidence) for one attribute of one incident."""
+        vector = self.vector(features, attribute)
+        keywords = self.keywords[attribute]
+        postings = self.postings[attribute]
+        similarities = np.zeros(len(keywords))
+        for f, w in vector.items():
+            if f in postings:
+                positions, weights = postings[f]
+                similarities[positions] += w * weights
+        scores = sorted(zip(similarities.tolist(), keywords), reverse=True)
+        best = scores[0][0] if scores else 0.0
+        if best >= min_similarity:
+            cutoff = max(min_similarity, best * self.secondary_ratio)
+            return [keyword for score, keyword in scores[:max_keywords] if score >= cutoff], best
+
+        # No learned keyword is close: use the most frequent noun chunk of the cue sentences
+        chunks = features["chunks"][attribute] or Counter(
+            {f[3:]: n for f, n in features["general"].items() if f.startswith("np:")}
+        )
+        if chunks:
+            return [chunks.most_common(1)[0][0].title()], best
+        return ["Unknown"], 0.0
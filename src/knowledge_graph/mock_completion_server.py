@@ -0,0 +1,73 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for exercising the extraction engine
+without API cost.
+
+    python mock_completion_server.py
+    OPENAI_API_BASE=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test python "7_extract_entity_keyword concise.py"
+
+Every request answers with MOCK_CONTENT after LATENCY seconds; a FAILURE_RATE share of requests
+get a 429 or 503 instead, so retries and backoff can be observed.
+"""
+import json
+import time
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HOST = "127.0.0.1"
+PORT = 8765
+LATENCY = 0.5  # Seconds per completion
+FAILURE_RATE = 0.1  # Share of requests answered with 429/503
+
+MOCK_CONTENT = {
+    "Task": ["System Testing"],
+    "Event": ["Reactor Trip"],
+    "Cause": ["Equipment Failure"],
+    "Influence": ["Safety System Actuation"],
+    "Corrective Actions": ["Component Replacement"],
+    "Similar Events": []
+}
+
+
+class MockCompletionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(LATENCY)
+
+        if random.random() < FAILURE_RATE:
+            status = random.choice([429, 503])
+            self._send(status, {"error": {"message": "mock failure", "type": "mock_error"}},
+                       headers={"Retry-After": "1"} if status == 429 else None)
+            return
+
+        self._send(200, {
+            "id": "mock-completion",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(MOCK_CONTENT)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer((HOST, PORT), MockCompletionHandler)
+    print(f"Mock completion server listening on http://{HOST}:{PORT}/v1")
+    server.serve_forever()
@@ -0,0 +1,101 @@
+"""
+Persistent, content-addressed cache of GPT responses for the extraction scripts.
+
+Entries live in a SQLite file keyed by model, prompt-template hash and input-text hash, so a rerun
+(after a crash, or after switching between prompt variants and back) only pays for requests whose
+template or incident text actually changed. Eviction drops the least recently used entries beyond
+`max_entries` and entries not used for `max_age_days`.
+"""
+import time
+import sqlite3
+import hashlib
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, max_entries=200000, max_age_days=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                model TEXT NOT NULL,
+                template_hash TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (model, template_hash, input_hash)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used_at)")
+        self.conn.commit()
+
+    def get(self, key):
+        """Return the cached content for key = (model, template_hash, input_hash), or None."""
+        row = self.conn.execute(
+            "SELECT content FROM responses WHERE model = ? AND template_hash = ? AND input_hash = ?", key
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE responses SET last_used_at = ?, hit_count = hit_count + 1 "
+            "WHERE model = ? AND template_hash = ? AND input_hash = ?",
+            (time.time(), *key)
+        )
+        self.conn.commit()
+        return row[0]
+
+    def put(self, key, content):
+        now = time.time()
+        # Committed right away so a crashed run keeps every answer it already paid for
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (model, template_hash, input_hash, content, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, content, now, now)
+        )
+        self.conn.commit()
+
+    def evict(self):
+        """Apply the age and size limits; returns the number of entries removed."""
+        removed = 0
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed += self.conn.execute("DELETE FROM responses WHERE last_used_at < ?", (cutoff,)).rowcount
+        if self.max_entries is not None:
+            removed += self.conn.execute(
+                "DELETE FROM responses WHERE rowid IN ("
+                "SELECT rowid FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        self.conn.commit()
+        return removed
+
+    def stats(self):
+        total = self.hits + self.misses
+        entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        removed = self.evict()
+        stats = self.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"(hit rate {stats['hit_rate']:.1%}), {stats['entries']} entries, {removed} evicted.")
+        self.conn.close()
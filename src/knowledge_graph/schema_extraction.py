@@ -0,0 +1,181 @@
+"""
+Shared runner of the GPT extraction scripts (7_extract_entity_keyword*.py).
+
+The per-schema scripts only pick a schema from extraction_schemas.SCHEMAS and call
+run_extraction(); 7_extract_entity_keyword_multi.py builds its combined prompt and uses
+extract_rows() directly. Loading the LER table, the async engine, the response cache, batching,
+answer repair and the retry pass are wired up once here, so the settings below apply to every script.
+"""
+import os
+import sys
+import pandas as pd
+import openai
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "preprocessing"))
+from ler_store import load_table
+from extraction_engine import ChatRequest, run_requests
+from response_cache import ResponseCache
+from jsonl_checkpoint import JsonlWriter, completed_filenames, compact
+from batch_planner import run_batched
+from structured_output import FailedResponses, parse_response, response_shape, run_retry_pass
+from extraction_schemas import SCHEMAS, build_node
+
+# Load environment variables for API keys
+load_dotenv()
+openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# File paths
+LER_DF_PATH = "../../data/processed/2_updated_ler_df_latest.csv"  # Latest revision of each LER (preprocessing/6b_dedup_revisions.py)
+CLAUSE_CSV_PATH = "../../data/processed/3_ler_cfr.csv"  # Path to clause data CSV
+RESUME = True  # Skip incidents already in the checkpoint file; False starts over
+
+# Request settings (match them to the account's rate limits)
+MODEL = "gpt-4"
+CONCURRENCY = 8  # Requests in flight at once
+REQUESTS_PER_MINUTE = 200
+TOKENS_PER_MINUTE = 40000
+
+# Responses are cached by model, prompt template and incident text, shared by all extraction scripts
+CACHE_PATH = "../../data/processed/llm_response_cache.sqlite"
+CACHE_MAX_ENTRIES = 200000
+
+# Batched mode packs several incidents into one request to avoid repeating the instructions
+BATCH_MODE = False
+BATCH_TOKEN_BUDGET = 6000  # Prompt plus reserved output tokens per batched request
+MAX_BATCH_SIZE = 10  # Incidents per batched request
+
+# Answers that cannot be repaired locally are re-asked, at most this many times
+MAX_RETRY_ROUNDS = 2
+
+
+def checkpoint_path(output_json_path):
+    # Checkpoint file next to the output JSON, compacted into it at the end of a run
+    return os.path.splitext(output_json_path)[0] + ".jsonl"
+
+
+def load_incidents():
+    """LER rows merged with their CFR clauses."""
+    # Typed Parquet copies of the CSVs; dates are formatted back to text for the JSON output
+    ler_df = load_table(LER_DF_PATH, dates_as_text=True)
+    clause_df = load_table(CLAUSE_CSV_PATH, columns=["filename", "CFR"])
+
+    # Merge datasets on the "File Name" field
+    ler_df = pd.merge(ler_df, clause_df, left_on="File Name", right_on="filename", how="left")
+
+    # Debug: Display a sample of the merged data
+    print("\nSample of the merged data:")
+    print(ler_df.head())
+    return ler_df
+
+
+def combined_text(row):
+    # Combine relevant columns into a single text input
+    return " ".join(
+        str(row.get(col, "")) for col in ["Title", "Abstract", "Narrative"]
+    )
+
+
+def extract_rows(rows, template, system_prompt, max_tokens, on_answer, batch_mode=BATCH_MODE,
+                 batch_token_budget=BATCH_TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE, required=()):
+    """
+    Ask template (with {text} replaced by each row's incident text) for every row and call
+    on_answer(row, answer) in input order with each answer that parses into the template's shape.
+    required: top-level keys an answer must contain to count as usable (neither cached nor passed on otherwise).
+    Unusable answers are re-asked in up to MAX_RETRY_ROUNDS retry rounds; returns the rows that
+    still have none.
+    """
+    # Function to build the GPT request for one incident
+    def build_request(text):
+        return ChatRequest(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": template.format(text=text)}
+            ],
+            model=MODEL,
+            temperature=0,
+            max_tokens=max_tokens,
+            template=template,
+            input_text=text
+        )
+
+    # Expected answer format, taken from the example in the template
+    shape = response_shape(template)
+
+    def is_usable(content):
+        return parse_response(content, shape, required)[0] is not None
+
+    # Called once per row, in input order, with the GPT response (None if the request failed)
+    def handle_result(i, content):
+        answer, error = parse_response(content, shape, required)
+        if answer is None:
+            # Queued for the retry pass instead of being dropped
+            failed.add(i, combined_text(rows[i]), content, error)
+            return
+        on_answer(rows[i], answer)
+
+    # Extract all rows with bounded concurrency, answering repeated requests from the cache
+    cache = ResponseCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES)
+    engine_settings = dict(
+        concurrency=CONCURRENCY,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        cache=cache,
+        validate=is_usable
+    )
+    failed = FailedResponses()
+    try:
+        if batch_mode:
+            run_batched(
+                [(row.get("File Name", ""), combined_text(row)) for row in rows],
+                build_request,
+                handle_result,
+                token_budget=batch_token_budget,
+                max_batch_size=max_batch_size,
+                **engine_settings
+            )
+        else:
+            run_requests([build_request(combined_text(row)) for row in rows], handle_result, **engine_settings)
+
+        # Re-ask only the incidents whose answers could not be repaired
+        unresolved = run_retry_pass(failed, build_request, handle_result, max_rounds=MAX_RETRY_ROUNDS, **engine_settings)
+    finally:
+        cache.close()
+    unresolved_rows = [rows[i] for i, _, _, _ in unresolved]
+    if unresolved_rows:
+        print(f"{len(unresolved_rows)} incidents still have no usable answer and are left for the next run: "
+              + ", ".join(row.get("File Name", "") for row in unresolved_rows))
+    return unresolved_rows
+
+
+def run_extraction(schema_name, incident_list_path=None, resume=RESUME):
+    """
+    Extract one schema of extraction_schemas.SCHEMAS for every incident and write its output JSON.
+    incident_list_path: optional CSV with a "filename" column; only those incidents are sent.
+    """
+    schema = SCHEMAS[schema_name]
+    output_jsonl_path = checkpoint_path(schema.output_json_path)
+
+    ler_df = load_incidents()
+    if incident_list_path:
+        ler_df = ler_df[ler_df["File Name"].isin(set(pd.read_csv(incident_list_path)["filename"]))]
+
+    # Incidents already in the checkpoint file are skipped on a resumed run
+    done = completed_filenames(output_jsonl_path) if resume else set()
+    rows = [row for _, row in ler_df.iterrows() if row.get("File Name", "") not in done]
+    print(f"{len(done)} incidents already extracted, {len(rows)} to go.")
+
+    def write_answer(row, attributes):
+        # Ensure all attributes are filled with default values, then checkpoint the node
+        # (one JSON line, fsync'd periodically)
+        writer.write(build_node(row, schema.normalize(attributes)))
+
+    writer = JsonlWriter(output_jsonl_path, resume=resume)
+    try:
+        extract_rows(rows, schema.template, schema.system_prompt, schema.max_tokens, write_answer)
+    finally:
+        writer.close()
+
+    # Compact the checkpoint file into the JSON array read by the 8_kg scripts
+    node_count = compact(output_jsonl_path, schema.output_json_path)
+    print(f"\nKnowledge graph ({node_count} nodes) saved to {schema.output_json_path}.")
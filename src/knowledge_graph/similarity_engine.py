@@ -0,0 +1,180 @@
+"""
+Vectorized attribute similarity for the 8_kg scripts.
+
+Two incidents are linked when the joined keywords of one attribute (Task, or HSI Issues) have a
+cosine similarity of at least the threshold, and the similarities of a few other attributes are
+stored on the edge. Instead of encoding both texts for every pair, every distinct attribute text is
+encoded once in large batches. The normalized embeddings are stacked into one float32 matrix per
+attribute, and all pairs are scored as blocked matrix products (block_size rows against all
+incidents at a time, so memory stays at block_size x n floats).
+
+For corpora where even that is too slow, ann_pairs() links each incident only to its top-k
+neighbours from a CPU ANN index (faiss HNSW or IVF), and recall_report() measures on a sample how
+many of the exact method's pairs it still finds. cross_pairs() scores only the pairs that involve
+given incidents, for incremental loads.
+"""
+import numpy as np
+
+
+def attribute_text(event, attribute):
+    # The text the per-pair comparison embedded: the attribute's keywords joined by spaces
+    return " ".join(event["attributes"].get(attribute, []))
+
+
+def encode_texts(model, texts, batch_size=256, store=None):
+    """
+    One normalized embedding row per text; empty texts get a zero row, i.e. similarity 0.
+    With an EmbeddingStore (embedding_store.py), only texts it has not seen are encoded.
+    """
+    unique = sorted({text for text in texts if text})
+    dim = model.get_sentence_embedding_dimension()
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    if not unique:
+        return matrix
+    if store is not None:
+        vectors = store.encode(model, unique, batch_size=batch_size)
+    else:
+        vectors = model.encode(unique, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True,
+                               show_progress_bar=len(unique) > batch_size)
+    position = {text: k for k, text in enumerate(unique)}
+    for row, text in enumerate(texts):
+        if text:
+            matrix[row] = vectors[position[text]]
+    return matrix
+
+
+def attribute_matrices(model, data, attributes, batch_size=256, store=None):
+    """attribute -> (len(data) x dim) matrix of normalized embeddings."""
+    return {attribute: encode_texts(model, [attribute_text(event, attribute) for event in data], batch_size, store)
+            for attribute in attributes}
+
+
+def similar_pairs(matrices, key_attribute, threshold=0.8, block_size=512):
+    """
+    Yield (i, j, {attribute: similarity}) for every i < j whose key_attribute similarity is at least
+    threshold, in the same order as the nested i/j loops. The other attributes are only compared
+    for these pairs.
+    """
+    key = matrices[key_attribute]
+    n = len(key)
+    columns = np.arange(n)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        scores = key[start:stop] @ key.T
+        hits = (scores >= threshold) & (columns[None, :] > np.arange(start, stop)[:, None])
+        rows, cols = np.nonzero(hits)
+        if len(rows) == 0:
+            continue
+        similarities = {key_attribute: scores[rows, cols]}
+        for attribute, matrix in matrices.items():
+            if attribute != key_attribute:
+                similarities[attribute] = np.einsum("ij,ij->i", matrix[rows + start], matrix[cols])
+        for k in range(len(rows)):
+            yield int(rows[k] + start), int(cols[k]), {a: float(values[k]) for a, values in similarities.items()}
+
+
+def cross_pairs(matrices, key_attribute, rows, threshold=0.8, block_size=512):
+    """
+    The pairs of similar_pairs() that involve at least one of `rows` (positions of new or changed
+    incidents), as (i, j, {attribute: similarity}) with i < j. Costs len(rows) x n instead of n^2.
+    """
+    key = matrices[key_attribute]
+    rows = np.asarray(sorted(set(rows)), dtype=np.int64)
+    is_row = np.zeros(len(key), dtype=bool)
+    is_row[rows] = True
+    columns = np.arange(len(key))
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        scores = key[block] @ key.T
+        # A pair of two listed incidents is kept once, from its smaller position
+        hits = (scores >= threshold) & (columns[None, :] != block[:, None]) & ~(is_row[None, :] & (columns[None, :] < block[:, None]))
+        r, cols = np.nonzero(hits)
+        if len(r) == 0:
+            continue
+        first, second = np.minimum(block[r], cols), np.maximum(block[r], cols)
+        similarities = {attribute: np.einsum("ij,ij->i", matrix[first], matrix[second])
+                        for attribute, matrix in matrices.items()}
+        for k in range(len(r)):
+            yield int(first[k]), int(second[k]), {a: float(values[k]) for a, values in similarities.items()}
+
+
+def build_index(vectors, index_type="hnsw", hnsw_m=32, ef_search=128, nlist=None, nprobe=16):
+    """CPU inner-product index over normalized vectors (faiss-cpu): "hnsw" graph or "ivf" inverted lists."""
+    import faiss
+
+    dim = vectors.shape[1]
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = max(2 * hnsw_m, 200)
+        index.hnsw.efSearch = ef_search
+    elif index_type == "ivf":
+        nlist = nlist or max(1, min(len(vectors) // 39, int(4 * np.sqrt(len(vectors)))))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = min(nprobe, nlist)
+    else:
+        raise ValueError(f"Unknown ANN index type: {index_type}")
+    index.add(vectors)
+    return index
+
+
+def ann_pairs(matrices, key_attribute, threshold=0.8, top_k=50, index_type="hnsw", search_batch_size=4096,
+              **index_options):
+    """
+    Approximate counterpart of similar_pairs(): each incident is linked only to its top_k nearest
+    neighbours (by key_attribute) found in an ANN index, if they reach the threshold. Yields the same
+    (i, j, {attribute: similarity}) tuples with i < j, sorted by (i, j); similarities are exact.
+    """
+    key = matrices[key_attribute]
+    rows = np.flatnonzero(np.any(key != 0, axis=1))  # Incidents without text never reach the threshold
+    if len(rows) < 2:
+        return
+    index = build_index(np.ascontiguousarray(key[rows]), index_type, **index_options)
+    if index_type == "hnsw":
+        index.hnsw.efSearch = max(index.hnsw.efSearch, top_k + 1)
+
+    candidates = set()
+    k = min(top_k + 1, len(rows))  # The incident itself comes back as its own nearest neighbour
+    for start in range(0, len(rows), search_batch_size):
+        queries = rows[start:start + search_batch_size]
+        scores, ids = index.search(np.ascontiguousarray(key[queries]), k)
+        for i, row_scores, row_ids in zip(queries, scores, ids):
+            for score, pos in zip(row_scores, row_ids):
+                if pos >= 0 and score >= threshold and rows[pos] != i:
+                    j = int(rows[pos])
+                    candidates.add((min(int(i), j), max(int(i), j)))
+    if not candidates:
+        return
+
+    pairs = np.array(sorted(candidates))
+    first, second = pairs[:, 0], pairs[:, 1]
+    similarities = {attribute: np.einsum("ij,ij->i", matrix[first], matrix[second])
+                    for attribute, matrix in matrices.items()}
+    for k in np.flatnonzero(similarities[key_attribute] >= threshold):
+        yield int(first[k]), int(second[k]), {a: float(values[k]) for a, values in similarities.items()}
+
+
+def recall_report(matrices, key_attribute, linked, threshold=0.8, sample_size=500, block_size=512, seed=0):
+    """
+    Recall of an ANN run against the exact method on a sample of incidents: of the pairs the exact
+    method would link to a sampled incident, the share that `linked` (the (i, j) pairs of the ANN run) contains.
+    """
+    key = matrices[key_attribute]
+    n = len(key)
+    sample = np.random.default_rng(seed).choice(n, size=min(sample_size, n), replace=False)
+    exact = set()
+    for start in range(0, len(sample), block_size):
+        block = sample[start:start + block_size]
+        scores = key[block] @ key.T
+        for r, j in zip(*np.nonzero(scores >= threshold)):
+            i = int(block[r])
+            if i != j:
+                exact.add((min(i, int(j)), max(i, int(j))))
+    sampled = set(int(i) for i in sample)
+    found = {pair for pair in linked if pair[0] in sampled or pair[1] in sampled}
+    return {
+        "sampled_incidents": len(sample),
+        "exact_pairs": len(exact),
+        "ann_pairs": len(found),
+        "recall": len(exact & found) / len(exact) if exact else 1.0
+    }
@@ -0,0 +1,196 @@
+"""
+Tolerant parsing of GPT extraction responses, with a bounded retry pass for the ones that stay unusable.
+
+repair_json() accepts the near-JSON the model sometimes returns: fenced code blocks, prose around
+the object, trailing commas, single quotes and Python literals. The result is checked against the
+response format shown in the prompt template (response_shape()): it must be an object with at
+least one of the expected keys, and every expected key present must hold the expected type
+(a keyword list may also come back as a single string). Missing attributes are filled with the
+schema defaults later; keys whose absence would lose data (the per-schema sections of the combined
+prompt) are passed as `required` and must all be present.
+
+Responses that still fail are collected in FailedResponses instead of being dropped.
+run_retry_pass() re-asks only those incidents, showing the model its unusable answer, for at most
+`max_rounds` rounds. A retried answer that validates is stored in the cache under the original
+request's key, so the next run does not pay for it again.
+"""
+import re
+import ast
+import json
+from extraction_engine import ChatRequest, run_requests
+
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _outermost(text):
+    # From the first opening bracket to the last matching closing one
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]")
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def _requote(text):
+    # Turn single-quoted strings into double-quoted ones, leaving apostrophes inside double quotes alone
+    out = []
+    quote = None
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if quote is None:
+            if c in "\"'":
+                quote = c
+                out.append('"')
+            else:
+                out.append(c)
+        elif c == "\\" and i + 1 < len(text):
+            out.append(text[i:i + 2] if text[i + 1] != "'" else "'")
+            i += 1
+        elif c == quote:
+            quote = None
+            out.append('"')
+        elif c == '"':
+            out.append('\\"')
+        else:
+            out.append(c)
+        i += 1
+    return "".join(out)
+
+
+def repair_json(content):
+    """Parse a model answer as JSON, repairing common formatting slips. Raises ValueError if it cannot."""
+    if not isinstance(content, str):
+        raise ValueError("no response content")
+    fenced = FENCE_PATTERN.search(content)
+    text = _outermost((fenced.group(1) if fenced else content).strip())
+
+    candidates = [text]
+    text = TRAILING_COMMA_PATTERN.sub(r"\1", text)
+    candidates.append(text)
+    text = re.sub(r"\b(True|False|None)\b", lambda m: PYTHON_LITERALS[m.group(1)], _requote(text))
+    candidates.append(TRAILING_COMMA_PATTERN.sub(r"\1", text))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            pass
+    try:
+        return ast.literal_eval(candidates[0])
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise ValueError("response is not valid JSON and could not be repaired")
+
+
+def split_template(template):
+    """Split a single-incident template into (instructions, response schema)."""
+    head, sep, rest = template.partition("Incident Description:")
+    _, sep2, schema = rest.partition("Respond strictly in JSON format:")
+    if not sep or not sep2:
+        raise ValueError("Prompt template has no 'Incident Description:' / 'Respond strictly in JSON format:' sections")
+
+    def unescape(text):
+        return text.replace("{{", "{").replace("}}", "}").strip()
+
+    return unescape(head), unescape(schema)
+
+
+def response_shape(template):
+    """The example answer of a prompt template ("Respond strictly in JSON format: {...}")."""
+    return json.loads(split_template(template)[1])
+
+
+def check_shape(value, shape, path="response", required=()):
+    """
+    Error message if value does not match the example answer, else None.
+    required: top-level keys that must be present; other keys may be missing as long as one is there.
+    """
+    if isinstance(shape, dict):
+        if not isinstance(value, dict):
+            return f"{path} is not a JSON object"
+        missing = [key for key in required if key not in value]
+        if missing:
+            return f"{path} is missing the keys {missing}"
+        present = [key for key in shape if key in value]
+        if not present:
+            return f"{path} has none of the keys {list(shape)}"
+        for key in present:
+            error = check_shape(value[key], shape[key], f"{path}[{key!r}]")
+            if error:
+                return error
+        return None
+    if isinstance(shape, list):
+        # A bare keyword instead of a one-element list is kept, like the scripts' string defaults
+        if isinstance(value, str) or (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+            return None
+        return f"{path} is not a list of strings"
+    if isinstance(shape, str) and not isinstance(value, str):
+        return f"{path} is not a string"
+    return None
+
+
+def parse_response(content, shape, required=()):
+    """(parsed answer, None) or (None, error message)."""
+    try:
+        value = repair_json(content)
+    except ValueError as e:
+        return None, str(e)
+    error = check_shape(value, shape, required=required)
+    return (None, error) if error else (value, None)
+
+
+class FailedResponses:
+    """Incidents whose answer could not be used, waiting for the retry pass."""
+
+    def __init__(self):
+        self.items = []  # (index, text, content, error)
+
+    def add(self, index, text, content, error):
+        self.items.append((index, text, content, error))
+
+    def take(self):
+        items, self.items = self.items, []
+        return items
+
+    def __len__(self):
+        return len(self.items)
+
+
+def retry_request(request, content, error):
+    """Follow-up to a request whose answer was unusable; it carries no template, so it bypasses the cache."""
+    if content is None:
+        messages = request.messages
+    else:
+        messages = request.messages + [
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": f"That answer could not be used ({error}). "
+                                        "Respond again with only the JSON object in the requested format."}
+        ]
+    return ChatRequest(messages, model=request.model, temperature=request.temperature, max_tokens=request.max_tokens)
+
+
+def run_retry_pass(failed, build_request, on_result, max_rounds=2, cache=None, validate=None, **engine_kwargs):
+    """
+    Re-ask the incidents in `failed` for up to max_rounds rounds. on_result(index, content) is the
+    script's handler, which puts incidents that fail again back into `failed`.
+    Returns the (index, text, content, error) entries still failing afterwards.
+    """
+    for round_no in range(1, max_rounds + 1):
+        pending = failed.take()
+        if not pending:
+            break
+        print(f"Retry round {round_no}: {len(pending)} incidents without a usable answer.")
+        originals = [build_request(text) for _, text, _, _ in pending]
+        requests = [retry_request(original, content, error)
+                    for original, (_, _, content, error) in zip(originals, pending)]
+
+        def on_retry(k, content):
+            key = originals[k].cache_key
+            if content is not None and cache is not None and key is not None and (validate is None or validate(content)):
+                cache.put(key, content)
+            on_result(pending[k][0], content)
+
+        run_requests(requests, on_retry, desc=f"Retry round {round_no}", validate=validate, **engine_kwargs)
+    return failed.take()
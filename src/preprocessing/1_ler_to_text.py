@@ -1,53 +1,166 @@
 import os
 import re
-import pdfplumber
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
 from tqdm import tqdm
+from pdf_backends import get_backend
 
 RAW_LER_DIR = "../../data/raw/ler"
 OUTPUT_TEXT_DIR = "../../data/processed/ler_text"
+MANIFEST_PATH = "../../data/processed/ler_text_manifest.json"  # content hash, size and mtime per PDF
 
-os.makedirs(OUTPUT_TEXT_DIR, exist_ok=True)
+PDF_BACKEND = "pdfplumber"  # "pdfplumber", "pypdfium2" or "pypdf" (see bench_pdf_backends.py)
+NUM_WORKERS = os.cpu_count() or 1  # Set to 1 to extract serially in this process
+MANIFEST_SAVE_EVERY = 100  # Flush the manifest after this many extracted files
 
-def process_all_pdfs(raw_dir, output_dir):
-    pdf_files = [f for f in os.listdir(raw_dir) if f.lower().endswith(".pdf")]
+MARKER_SEARCH_PAGES = 10  # Look for the LER form on the first N pages only (None searches every page)
+MAX_FORM_PAGES = None  # Cap on pages written from the form section onwards (None writes to the end)
+
+LER_MARKER = "LICENSEE EVENT REPORT (LER)"
+LER_MARKER_COMPACT = LER_MARKER.replace(" ", "")
+ERROR_TEXT = "Error extracting text."
+
+def stream_pdf_text(pdf_path, out, backend, search_pages=MARKER_SEARCH_PAGES, max_pages=MAX_FORM_PAGES):
+    # Write the LER section of a single PDF to `out` page by page; every page is laid out at most once.
+    # Returns the number of pages written (0 if no LER page was found).
+    written = 0
+    with closing(backend.iter_pages(pdf_path)) as pages:
+        for idx, page in enumerate(pages):
+            if written == 0:
+                if search_pages is not None and idx >= search_pages:
+                    break
+                # Spaces are not reliable in the cheap marker text, so compare without them
+                marker_text = backend.page_marker_text(page).upper().replace(" ", "")
+                if LER_MARKER_COMPACT not in marker_text:
+                    backend.release(page)
+                    continue
+            text = backend.page_text(page)
+            if written:
+                out.write("\n")
+            out.write(text)
+            written += 1
+            backend.release(page)
+            if max_pages is not None and written >= max_pages:
+                break
+
+    if written == 0:
+        # If no LER page is found in the PDF, handle it with a "Not Found" message
+        out.write("LICENSEE EVENT REPORT (LER) not found.")
+    return written
+
+def process_pdf(pdf_file, raw_dir, output_dir, backend_name=PDF_BACKEND):
+    # Convert one PDF to a .txt file; returns (pdf_file, ok)
+    pdf_path = os.path.join(raw_dir, pdf_file)
+    txt_filename = os.path.splitext(pdf_file)[0] + ".txt"
+    txt_path = os.path.join(output_dir, txt_filename)
+    try:
+        with open(txt_path, "w", encoding="utf-8") as f:
+            stream_pdf_text(pdf_path, f, get_backend(backend_name))
+        return pdf_file, True
+    except Exception as e:
+        # If an error occurs during PDF processing, log the error and overwrite any partial output
+        print(f"Error processing {pdf_file}: {e}")
+        with open(txt_path, "w", encoding="utf-8") as f:
+            f.write(ERROR_TEXT)
+        return pdf_file, False
+
+def file_sha256(path, chunk_size=1 << 20):
+    # Hash the file contents in chunks
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(manifest_path):
+    # Load {pdf_file: {"sha256", "size", "mtime"}}; a missing or broken manifest means "extract everything"
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+def save_manifest(manifest, manifest_path):
+    # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
 
-    for pdf_file in tqdm(pdf_files, desc="Processing LER PDFs", unit="file"):
+def find_changed_pdfs(pdf_files, raw_dir, output_dir, manifest, backend_name=PDF_BACKEND):
+    # Return (pending, fingerprints): PDFs that are new, whose content changed since the last run,
+    # or that were extracted with another backend.
+    # Size and mtime are checked first; the content hash is only computed when they differ.
+    pending = []
+    fingerprints = {}
+    for pdf_file in pdf_files:
         pdf_path = os.path.join(raw_dir, pdf_file)
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                start_page = None
-                # Check each page's text for the presence of "LICENSEE EVENT REPORT (LER)"
-                for idx, page in enumerate(pdf.pages):
-                    text = page.extract_text() or ""
-                    # Check if the text contains "LICENSEE EVENT REPORT (LER)"
-                    if "LICENSEE EVENT REPORT (LER)" in text.upper():
-                        start_page = idx
-                        break
-
-                if start_page is None:
-                    # If no LER page is found in the PDF, handle it with empty text or a "Not Found" message
-                    extracted_text = "LICENSEE EVENT REPORT (LER) not found."
-                else:
-                    # Extract text from start_page to the last page and concatenate it
-                    extracted_texts = []
-                    for p_idx in range(start_page, len(pdf.pages)):
-                        p_text = pdf.pages[p_idx].extract_text() or ""
-                        extracted_texts.append(p_text)
-                    extracted_text = "\n".join(extracted_texts)
-
-                # Save the extracted text as a .txt file
-                txt_filename = os.path.splitext(pdf_file)[0] + ".txt"
-                txt_path = os.path.join(output_dir, txt_filename)
-                with open(txt_path, "w", encoding="utf-8") as f:
-                    f.write(extracted_text)
-
-        except Exception as e:
-            # If an error occurs during PDF processing, log the error and create an empty file
-            print(f"Error processing {pdf_file}: {e}")
-            txt_filename = os.path.splitext(pdf_file)[0] + ".txt"
-            txt_path = os.path.join(output_dir, txt_filename)
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write("Error extracting text.")
+        stat = os.stat(pdf_path)
+        txt_path = os.path.join(output_dir, os.path.splitext(pdf_file)[0] + ".txt")
+        entry = manifest.get(pdf_file)
+
+        if entry and entry.get("backend", "pdfplumber") == backend_name and os.path.exists(txt_path):
+            if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                continue
+            sha256 = file_sha256(pdf_path)
+            if entry["sha256"] == sha256:
+                # Touched but unchanged: refresh the stat fields and skip
+                manifest[pdf_file] = dict(entry, size=stat.st_size, mtime=stat.st_mtime)
+                continue
+        else:
+            sha256 = file_sha256(pdf_path)
+
+        pending.append(pdf_file)
+        fingerprints[pdf_file] = {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime, "backend": backend_name}
+    return pending, fingerprints
+
+def process_all_pdfs(raw_dir, output_dir, workers=NUM_WORKERS, manifest_path=MANIFEST_PATH, backend_name=PDF_BACKEND,
+                     incidents=None):
+    # `incidents`: optional set of LER file names (without extension) to re-extract; all others are left alone
+    pdf_files = [f for f in os.listdir(raw_dir) if f.lower().endswith(".pdf")]
+
+    manifest = load_manifest(manifest_path)
+    # Forget PDFs that have been removed from the raw directory
+    present = set(pdf_files)
+    manifest = {k: v for k, v in manifest.items() if k in present}
+    if incidents:
+        pdf_files = [f for f in pdf_files if os.path.splitext(f)[0] in incidents]
+        # Drop their manifest entries so they are extracted even if unchanged
+        for pdf_file in pdf_files:
+            manifest.pop(pdf_file, None)
+    pending, fingerprints = find_changed_pdfs(pdf_files, raw_dir, output_dir, manifest, backend_name)
+    print(f"{len(pdf_files)} PDFs found, {len(pdf_files) - len(pending)} unchanged, {len(pending)} to extract.")
+
+    def record(pdf_file, ok, done):
+        # Failed files stay out of the manifest so the next run retries them
+        if ok:
+            manifest[pdf_file] = fingerprints[pdf_file]
+        if manifest_path and done % MANIFEST_SAVE_EVERY == 0:
+            save_manifest(manifest, manifest_path)
+
+    if workers <= 1:
+        for done, pdf_file in enumerate(tqdm(pending, desc="Processing LER PDFs", unit="file"), 1):
+            _, ok = process_pdf(pdf_file, raw_dir, output_dir, backend_name)
+            record(pdf_file, ok, done)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_pdf, f, raw_dir, output_dir, backend_name) for f in pending]
+            progress = tqdm(as_completed(futures), total=len(futures), desc="Processing LER PDFs", unit="file")
+            for done, future in enumerate(progress, 1):
+                pdf_file, ok = future.result()
+                record(pdf_file, ok, done)
+
+    if manifest_path:
+        save_manifest(manifest, manifest_path)
 
 # Execute
-process_all_pdfs(RAW_LER_DIR, OUTPUT_TEXT_DIR)
\ No newline at end of file
+if __name__ == "__main__":
+    os.makedirs(OUTPUT_TEXT_DIR, exist_ok=True)
+    # Set by src/run/pipeline.py --incidents for partial reruns
+    incidents = {name for name in os.environ.get("PIPELINE_INCIDENTS", "").split(",") if name}
+    process_all_pdfs(RAW_LER_DIR, OUTPUT_TEXT_DIR, incidents=incidents or None)
@@ -1,104 +1,82 @@
 import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from tqdm import tqdm
+from section_scanner import SectionScanner, join_section
 
 LER_TEXT_DIR = "../../data/processed/ler_text"
 OUTPUT_CSV_PATH = "../../data/processed/ler_df.csv"
-
-def find_line(keyword, lines):
-    # Find the index of the line containing the specified keyword
-    for i, l in enumerate(lines):
-        if keyword.lower() in l.lower():
-            return i
-    return None
-
-def extract_multi_line_section(lines, start_keyword, stop_keyword):
-    # Extract a section of text between start_keyword and stop_keyword
-    start_idx = find_line(start_keyword, lines)
-    if start_idx is None:
-        return "Not Found"
-    start_idx = start_idx + 1
-    extracted = []
-    for i in range(start_idx, len(lines)):
-        if stop_keyword.lower() in lines[i].lower():
-            break
-        extracted.append(lines[i])
-    return " ".join(extracted).strip() if extracted else "Not Found"
-
-def extract_abstract(lines):
-    # Extract the abstract section of the text
-    abs_idx = find_line("16. Abstract", lines)
-    if abs_idx is None:
-        return "Not Found"
-    extracted = []
-    for l in lines[abs_idx+1:]:
-        if "NRC FORM" in l:
-            break
-        extracted.append(l)
-    return " ".join(extracted).strip() if extracted else "Not Found"
-
-def extract_cfr(lines):
+OUTPUT_PARQUET_PATH = "../../data/processed/ler_df.parquet"
+
+PARALLEL = True  # Parse in worker processes and stream into Parquet; False keeps the serial in-memory CSV path
+NUM_WORKERS = os.cpu_count() or 1
+ROW_GROUP_SIZE = 1000  # Rows buffered per Parquet row group (bounds peak memory)
+CHUNK_SIZE = 32  # Files parsed per worker task
+CHUNKS_PER_WORKER = 2  # Tasks queued or finished ahead of the writer per worker (bounds results waiting behind a slow file)
+EXPORT_CSV = True  # Also export the Parquet file to OUTPUT_CSV_PATH
+
+# Section markers, matched in a single pass per file
+SCANNER = SectionScanner({
+    "facility": ("1. Facility Name", True),
+    "title": ("4. Title", True),
+    "event_date": ("5. Event Date", True),
+    "abstract": ("16. Abstract", True),
+    "cfr": ("11. This Report is Submitted Pursuant", True),
+    "narrative": ("NARRATIVE", True),
+    "nrc_form": ("NRC FORM", False),
+    "nrc_form_366a": ("NRC FORM 366A", False),
+})
+
+CFR_PATTERN = re.compile(r"/\s*([0-9]+\.[0-9]+\(a\)\(\d+\)\(iv\)\([A-Za-z]+\))")
+# Date/LER Pattern (Handle with or without hyphens)
+DATE_LER_PATTERN = re.compile(r"\b(\d{2})\s+(\d{2})\s+(\d{4})\s+(\d{4})(?:\s*-?\s*)(\d{3})(?:\s*-?\s*)(\d{2})\b")
+
+def extract_cfr(lines, scan):
     # Extract the CFR information from the text
-    cfr_start = find_line("11. This Report is Submitted Pursuant", lines)
+    cfr_start = scan.first("cfr")
     if cfr_start is None:
         return "Not Found"
-    cfr_pattern = re.compile(r"/\s*([0-9]+\.[0-9]+\(a\)\(\d+\)\(iv\)\([A-Za-z]+\))")
     for i in range(cfr_start, len(lines)):
-        cm = cfr_pattern.search(lines[i])
+        cm = CFR_PATTERN.search(lines[i])
         if cm:
             return cm.group(1)
     return "Not Found"
 
-def extract_narrative(lines):
-    # Extract the narrative section of the text
-    nar_idx = find_line("NARRATIVE", lines)
-    if nar_idx is None:
-        return "Not Found"
-    extracted = []
-    for l in lines[nar_idx+1:]:
-        if "NRC FORM 366A" in l:
-            break
-        extracted.append(l)
-    return " ".join(extracted).strip() if extracted else "Not Found"
-
 def process_txt_file(txt_path):
     # Process a single text file and extract relevant information
     with open(txt_path, "r", encoding="utf-8") as f:
         lines = [line.replace("(cid:9)", " ").strip() for line in f]
 
+    scan = SCANNER.scan(lines)
+
     facility_name = "Not Found"
-    title = "Not Found"
     event_date = "Not Found"
     ler_number = "Not Found"
-    abstract = "Not Found"
-    cfr = "Not Found"
-    narrative = "Not Found"
 
     # Get the file name without extension
     file_name = os.path.splitext(os.path.basename(txt_path))[0]
 
     # Facility Name
-    idx_fname = find_line("1. Facility Name", lines)
+    idx_fname = scan.first("facility")
     if idx_fname is not None and idx_fname+1 < len(lines):
         facility_name = lines[idx_fname+1]
 
     # Title
-    title = extract_multi_line_section(lines, "4. Title", "5. Event Date")
+    title = join_section(lines, scan.section("title", "event_date"))
 
     # Abstract
-    abstract = extract_abstract(lines)
+    abstract = join_section(lines, scan.section("abstract", "nrc_form"))
 
     # CFR
-    cfr = extract_cfr(lines)
+    cfr = extract_cfr(lines, scan)
 
     # Narrative
-    narrative = extract_narrative(lines)
+    narrative = join_section(lines, scan.section("narrative", "nrc_form_366a"))
 
-    # Date/LER Pattern (Handle with or without hyphens)
-    date_ler_pattern = re.compile(r"\b(\d{2})\s+(\d{2})\s+(\d{4})\s+(\d{4})(?:\s*-?\s*)(\d{3})(?:\s*-?\s*)(\d{2})\b")
     for l in lines:
-        m = date_ler_pattern.search(l)
+        m = DATE_LER_PATTERN.search(l)
         if m:
             mm, dd, yyyy = m.group(1), m.group(2), m.group(3)
             event_date = f"{mm}-{dd}-{yyyy}"
@@ -116,6 +94,8 @@ def process_txt_file(txt_path):
         "File Name": file_name
     }
 
+OUTPUT_COLUMNS = ["Facility Name", "Title", "Event Date", "Abstract", "Narrative", "File Name"]
+
 def process_all_txt(txt_dir, output_csv_path):
     # Process all text files in the directory and save results to a CSV file
     txt_files = [f for f in os.listdir(txt_dir) if f.lower().endswith(".txt")]
@@ -129,5 +109,82 @@ def process_all_txt(txt_dir, output_csv_path):
     df = pd.DataFrame(extracted_data)
     df.to_csv(output_csv_path, index=False, encoding="utf-8")
 
+def process_txt_chunk(txt_paths):
+    # Worker task: parse a chunk of text files
+    return [process_txt_file(txt_path) for txt_path in txt_paths]
+
+def process_all_txt_parallel(txt_dir, output_parquet_path, workers=NUM_WORKERS, row_group_size=ROW_GROUP_SIZE,
+                             chunk_size=CHUNK_SIZE, chunks_per_worker=CHUNKS_PER_WORKER):
+    # Parse text files in worker processes and stream the rows into a Parquet file, one row group at a time
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    txt_files = sorted(f for f in os.listdir(txt_dir) if f.lower().endswith(".txt"))
+    txt_paths = [os.path.join(txt_dir, f) for f in txt_files]
+    chunks = [txt_paths[start:start + chunk_size] for start in range(0, len(txt_paths), chunk_size)]
+    schema = pa.schema([(col, pa.string()) for col in OUTPUT_COLUMNS])
+
+    def flush(writer, rows):
+        table = pa.Table.from_pylist(rows, schema=schema)
+        writer.write_table(table, row_group_size=row_group_size)
+        rows.clear()
+
+    rows = []
+    with pq.ParquetWriter(output_parquet_path, schema, compression="zstd") as writer, \
+            ProcessPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=len(txt_paths), desc="Processing TXT files", unit="file") as progress:
+        # Only a window of chunks is submitted at a time and refilled as results are written in order,
+        # so a slow file holds back at most workers * chunks_per_worker chunks of finished rows
+        pending = deque()
+        next_chunk = 0
+        while pending or next_chunk < len(chunks):
+            while next_chunk < len(chunks) and len(pending) < workers * chunks_per_worker:
+                pending.append(executor.submit(process_txt_chunk, chunks[next_chunk]))
+                next_chunk += 1
+            chunk_rows = pending.popleft().result()
+            progress.update(len(chunk_rows))
+            for fields in chunk_rows:
+                rows.append(fields)
+                if len(rows) >= row_group_size:
+                    flush(writer, rows)
+        if rows:
+            flush(writer, rows)
+
+def export_parquet_to_csv(parquet_path, output_csv_path, batch_size=ROW_GROUP_SIZE):
+    # Convert the Parquet output to CSV batch by batch, without loading the whole table
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(parquet_path)
+    header = True
+    with open(output_csv_path, "w", encoding="utf-8", newline="") as f:
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            batch.to_pandas().to_csv(f, index=False, header=header)
+            header = False
+
+def update_incidents(txt_dir, incidents, output_parquet_path, output_csv_path):
+    # Re-parse only the given text files and replace their rows in the existing outputs
+    txt_paths = [os.path.join(txt_dir, f"{name}.txt") for name in sorted(incidents)]
+    new_df = pd.DataFrame([process_txt_file(p) for p in txt_paths if os.path.exists(p)], columns=OUTPUT_COLUMNS)
+    if os.path.exists(output_parquet_path):
+        df = pd.read_parquet(output_parquet_path)
+        df = pd.concat([df[~df["File Name"].isin(incidents)], new_df], ignore_index=True)
+    else:
+        df = new_df
+    df.to_parquet(output_parquet_path, index=False)
+    df.to_csv(output_csv_path, index=False, encoding="utf-8")
+    print(f"Updated {len(new_df)} incidents in {output_parquet_path} and {output_csv_path}")
+
 # Execute
-process_all_txt(LER_TEXT_DIR, OUTPUT_CSV_PATH)
+if __name__ == "__main__":
+    # Set by src/run/pipeline.py --incidents for partial reruns
+    incidents = {name for name in os.environ.get("PIPELINE_INCIDENTS", "").split(",") if name}
+    if incidents:
+        update_incidents(LER_TEXT_DIR, incidents, OUTPUT_PARQUET_PATH, OUTPUT_CSV_PATH)
+    elif PARALLEL:
+        process_all_txt_parallel(LER_TEXT_DIR, OUTPUT_PARQUET_PATH)
+        print(f"Parquet saved to {OUTPUT_PARQUET_PATH}")
+        if EXPORT_CSV:
+            export_parquet_to_csv(OUTPUT_PARQUET_PATH, OUTPUT_CSV_PATH)
+            print(f"CSV exported to {OUTPUT_CSV_PATH}")
+    else:
+        process_all_txt(LER_TEXT_DIR, OUTPUT_CSV_PATH)
@@ -1,9 +1,9 @@
-import pandas as pd
+from ler_store import load_table, save_table
 
 CSV_PATH = "../../data/processed/ler_df_dateadded.csv"  # Path to the CSV file
 OUTPUT_FILTERED_CSV = "../../data/processed/ler_df_filtered.csv"  # Filtered CSV output path
 
-df = pd.read_csv(CSV_PATH, encoding="Windows-1252")
+df = load_table(CSV_PATH)  # Typed Parquet copy; the CSV encoding is detected when it is (re)built
 
 # df.eq("Not Found") creates a DataFrame of True/False values (True where cell is "Not Found")
 # any(axis=1) returns True if any "Not Found" value appears in the row
@@ -21,5 +21,5 @@ remaining_rows_count = len(filtered_df)
 print("Number of remaining data points after filtering:", remaining_rows_count)
 
 # Save the filtered DataFrame to a new CSV file
-filtered_df.to_csv(OUTPUT_FILTERED_CSV, index=False, encoding="utf-8")
+save_table(filtered_df, OUTPUT_FILTERED_CSV)
 print("Filtered CSV saved to:", OUTPUT_FILTERED_CSV)
@@ -1,12 +1,13 @@
 import pandas as pd
 import re
 import os
+from ler_store import load_table
 
 # Set paths
 CSV_PATH = "../../data/processed/ler_cfr.csv"
 CFR_OUTPUT_PATH =  "../../data/processed/cfr_empty.csv"
 
-df = pd.read_csv(CSV_PATH, encoding="utf-8")
+df = load_table(CSV_PATH, columns=["CFR"])  # Only the CFR column is needed
 
 # Combine all CFR items into a single list
 all_cfr = []
@@ -0,0 +1,15 @@
+from ler_store import load_table, save_table
+from ler_revisions import latest_revisions
+
+CSV_PATH = "../../data/processed/2_updated_ler_df.csv"  # Checked LER table
+OUTPUT_CSV = "../../data/processed/2_updated_ler_df_latest.csv"  # One row per LER number, read by the extraction scripts
+KEEP_HISTORY = True  # Add a "Revisions" column listing every revision's filename
+
+df = load_table(CSV_PATH)
+
+# Keep only the latest revision of each LER number (0252022002R01 replaces 0252022002R00)
+latest_df = latest_revisions(df, history_column="Revisions" if KEEP_HISTORY else None)
+print(f"{len(df)} reports, {len(latest_df)} distinct LER numbers ({len(df) - len(latest_df)} older revisions dropped).")
+
+save_table(latest_df, OUTPUT_CSV)
+print("Latest-revision CSV saved to:", OUTPUT_CSV)
@@ -0,0 +1,95 @@
+import os
+import time
+import random
+import difflib
+import pandas as pd
+from contextlib import closing
+from tqdm import tqdm
+from pdf_backends import BACKENDS, get_backend
+
+RAW_LER_DIR = "../../data/raw/ler"
+OUTPUT_CSV_PATH = "../../data/processed/pdf_backend_benchmark.csv"
+
+REFERENCE_BACKEND = "pdfplumber"  # Fidelity is measured against this engine's output
+SAMPLE_SIZE = 50  # Number of PDFs sampled from RAW_LER_DIR
+RANDOM_SEED = 42
+
+def extract_document(backend, pdf_path):
+    # Extract every page of a PDF; returns (text, page_count)
+    texts = []
+    with closing(backend.iter_pages(pdf_path)) as pages:
+        for page in pages:
+            texts.append(backend.page_text(page))
+            backend.release(page)
+    return "\n".join(texts), len(texts)
+
+def fidelity(reference_text, text):
+    # Token-level similarity (0-1) against the reference output; whitespace and line breaks are ignored
+    matcher = difflib.SequenceMatcher(None, reference_text.split(), text.split(), autojunk=False)
+    return matcher.ratio()
+
+def benchmark_backend(backend_name, pdf_paths, reference_texts):
+    # Time one backend over the sample and score it against the reference texts
+    backend = get_backend(backend_name)
+    total_pages = 0
+    elapsed = 0.0
+    scores = []
+    errors = 0
+    texts = {}
+    for pdf_path in tqdm(pdf_paths, desc=f"Benchmarking {backend_name}", unit="file"):
+        try:
+            start = time.perf_counter()
+            text, pages = extract_document(backend, pdf_path)
+            elapsed += time.perf_counter() - start
+        except ImportError:
+            # The engine is not installed; let run_benchmark skip it
+            raise
+        except Exception as e:
+            print(f"{backend_name} failed on {os.path.basename(pdf_path)}: {e}")
+            errors += 1
+            continue
+        total_pages += pages
+        texts[pdf_path] = text
+        if reference_texts is not None and pdf_path in reference_texts:
+            scores.append(fidelity(reference_texts[pdf_path], text))
+
+    result = {
+        "backend": backend_name,
+        "files": len(pdf_paths) - errors,
+        "errors": errors,
+        "pages": total_pages,
+        "seconds": round(elapsed, 2),
+        "pages_per_sec": round(total_pages / elapsed, 1) if elapsed else 0.0,
+        "mean_fidelity": round(sum(scores) / len(scores), 4) if scores else None,
+        "min_fidelity": round(min(scores), 4) if scores else None,
+    }
+    return result, texts
+
+def run_benchmark(raw_dir, sample_size=SAMPLE_SIZE, backends=None):
+    pdf_files = sorted(f for f in os.listdir(raw_dir) if f.lower().endswith(".pdf"))
+    random.Random(RANDOM_SEED).shuffle(pdf_files)
+    pdf_paths = [os.path.join(raw_dir, f) for f in pdf_files[:sample_size]]
+    print(f"Benchmarking on {len(pdf_paths)} PDFs from {raw_dir}")
+
+    # The reference runs first so every other backend can be scored against it
+    names = [REFERENCE_BACKEND] + [b for b in (backends or BACKENDS) if b != REFERENCE_BACKEND]
+    results = []
+    reference_texts = None
+    for name in names:
+        try:
+            result, texts = benchmark_backend(name, pdf_paths, reference_texts)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        if name == REFERENCE_BACKEND:
+            reference_texts = texts
+        results.append(result)
+
+    return pd.DataFrame(results)
+
+# Execute
+if __name__ == "__main__":
+    results_df = run_benchmark(RAW_LER_DIR)
+    print(results_df.to_string(index=False))
+    results_df.to_csv(OUTPUT_CSV_PATH, index=False, encoding="utf-8")
+    print(f"Benchmark results saved to {OUTPUT_CSV_PATH}")
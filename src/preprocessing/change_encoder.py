@@ -1,10 +1,11 @@
-import pandas as pd
+from ler_store import read_csv_any_encoding, save_table
 
 input_file = "../../data/processed/2_ler_df_filtered_checked.csv"
 output_file = "../../data/processed/2_ler_df_filtered_checked.csv"
 
-data = pd.read_csv(input_file, encoding='Windows-1252')
+data = read_csv_any_encoding(input_file)
 
-data.to_csv(output_file, index=False, encoding='utf-8')
+# Writes the UTF-8 CSV and its typed Parquet copy
+save_table(data, output_file)
 
 print(f"File has been re-encoded and saved to {output_file}")
@@ -0,0 +1,56 @@
+"""
+Revision handling for LER filenames.
+
+An LER number can be reported several times: 0252022002R00 is the original report and
+0252022002R01 its first revision. Revisions describe the same event, so only the latest one should
+be extracted and inserted into the graph; the earlier filenames are kept as its revision history.
+"""
+import re
+
+REVISION_PATTERN = re.compile(r"^(?P<base>.+?)R(?P<revision>\d+)$", re.IGNORECASE)
+HISTORY_SEPARATOR = ";"
+
+
+def split_revision(filename):
+    """(base LER number, revision) for a filename like 0252022002R01; no suffix counts as revision 0."""
+    match = REVISION_PATTERN.match(str(filename).strip())
+    if match is None:
+        return str(filename).strip(), 0
+    return match.group("base"), int(match.group("revision"))
+
+
+def latest_revisions(df, column="File Name", history_column="Revisions"):
+    """
+    Keep one row per base LER number, the one with the highest revision, in the original row order.
+    With history_column, that row also lists every revision's filename (oldest first, ";"-separated).
+    """
+    parts = df[column].map(split_revision)
+    ranked = df.assign(_base=parts.str[0], _revision=parts.str[1]).sort_values(["_base", "_revision"], kind="stable")
+    latest = ranked.groupby("_base", sort=False).tail(1).copy()
+    if history_column:
+        history = ranked.groupby("_base", sort=False)[column].agg(lambda names: HISTORY_SEPARATOR.join(map(str, names)))
+        latest[history_column] = latest["_base"].map(history)
+    return latest.drop(columns=["_base", "_revision"]).sort_index()
+
+
+def latest_nodes(nodes):
+    """
+    Same for extracted knowledge-graph nodes (e.g. a checkpoint that still holds an older revision):
+    keeps the latest revision per LER number and records all revisions in metadata["revisions"].
+    """
+    latest = {}
+    revisions = {}
+    for position, node in enumerate(nodes):
+        base, revision = split_revision(node.get("filename", ""))
+        names = revisions.setdefault(base, set())
+        names.add(node.get("filename", ""))
+        names.update(node.get("metadata", {}).get("revisions", []))
+        if base not in latest or revision >= latest[base][1]:
+            latest[base] = (position, revision)
+
+    kept = []
+    for base, (position, _) in sorted(latest.items(), key=lambda item: item[1][0]):
+        node = nodes[position]
+        node.setdefault("metadata", {})["revisions"] = sorted(revisions[base], key=lambda name: split_revision(name)[1])
+        kept.append(node)
+    return kept
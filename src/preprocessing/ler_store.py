@@ -0,0 +1,86 @@
+"""
+Typed columnar storage for the processed LER tables.
+
+Each CSV stage output gets a Parquet sibling (same path, .parquet extension) with parsed dates,
+categorical facility/unit/CFR columns and the raw text columns stored as-is. load_table() reads
+the Parquet file when it is up to date and only the requested columns, so stages that do not need
+the Narrative never load it. CSVs stay the exchange format for the manually edited stages; their
+encoding (UTF-8 or Windows-1252) is detected once, when the Parquet copy is made.
+"""
+import os
+import pandas as pd
+
+DATE_FORMAT = "%m-%d-%Y"  # As written by 2_text_to_df.py
+DATE_COLUMNS = ["Event Date"]
+CATEGORY_COLUMNS = ["Facility Name", "Unit", "CFR"]
+TEXT_COLUMNS = ["Title", "Abstract", "Narrative"]  # Large columns, only read when asked for
+
+CSV_ENCODINGS = ["utf-8", "Windows-1252"]
+
+
+def parquet_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def read_csv_any_encoding(csv_path, **kwargs):
+    """Read a CSV that may have been saved as UTF-8 or Windows-1252 (e.g. after editing in Excel)."""
+    for encoding in CSV_ENCODINGS[:-1]:
+        try:
+            return pd.read_csv(csv_path, encoding=encoding, **kwargs)
+        except UnicodeDecodeError:
+            pass
+    return pd.read_csv(csv_path, encoding=CSV_ENCODINGS[-1], **kwargs)
+
+
+def apply_types(df):
+    """Parse date columns and make facility/unit/CFR categorical."""
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df.columns and df[col].dtype == object:
+            parsed = pd.to_datetime(df[col], format=DATE_FORMAT, errors="coerce")
+            # Keep the text if any value does not parse ("Not Found", hand-edited dates), so nothing is lost
+            if not (parsed.isna() & df[col].notna()).any():
+                df[col] = parsed
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def save_table(df, csv_path, write_csv=True):
+    """Write the typed Parquet copy of a table and, unless disabled, the UTF-8 CSV next to it."""
+    df = apply_types(df)
+    if write_csv:
+        to_csv = df.copy()
+        for col in DATE_COLUMNS:
+            if col in to_csv.columns and pd.api.types.is_datetime64_any_dtype(to_csv[col]):
+                to_csv[col] = to_csv[col].dt.strftime(DATE_FORMAT)
+        to_csv.to_csv(csv_path, index=False, encoding="utf-8")
+    # Written after the CSV so load_table() sees the Parquet copy as up to date
+    df.to_parquet(parquet_path_for(csv_path), index=False)
+    return df
+
+
+def load_table(csv_path, columns=None, dates_as_text=False):
+    """
+    Load a processed LER table by its CSV path.
+
+    The Parquet sibling is used when it is at least as new as the CSV; otherwise the CSV is parsed
+    once and the Parquet copy refreshed. `columns` limits what is read from disk, and
+    `dates_as_text` formats parsed dates back to DATE_FORMAT strings (e.g. for JSON output).
+    """
+    parquet_path = parquet_path_for(csv_path)
+    csv_exists = os.path.exists(csv_path)
+    if os.path.exists(parquet_path) and (not csv_exists or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        df = pd.read_parquet(parquet_path, columns=columns)
+    else:
+        df = apply_types(read_csv_any_encoding(csv_path))
+        df.to_parquet(parquet_path, index=False)
+        if columns is not None:
+            df = df[columns]
+
+    if dates_as_text:
+        for col in DATE_COLUMNS:
+            if col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = df[col].dt.strftime(DATE_FORMAT)
+    return df
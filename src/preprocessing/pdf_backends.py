@@ -0,0 +1,100 @@
+"""
+PDF text backends for LER ingestion.
+
+Every backend yields one handle per page from iter_pages(); page_text() returns the laid-out text
+and page_marker_text() returns text that is only good enough for a marker search (it may skip
+the layout pass). pdfplumber is the reference engine; pypdfium2 (installed with pdfplumber) and
+pypdf are faster on the plain-layout NRC forms. Run bench_pdf_backends.py to see what fidelity
+each engine gives up against pdfplumber.
+"""
+from abc import ABC, abstractmethod
+
+
+class PdfBackend(ABC):
+    name = None
+
+    @abstractmethod
+    def iter_pages(self, pdf_path):
+        """Yield one handle per page of pdf_path."""
+
+    @abstractmethod
+    def page_text(self, page):
+        """Laid-out text of a page handle."""
+
+    def page_marker_text(self, page):
+        return self.page_text(page)
+
+    def release(self, page):
+        pass
+
+
+class PdfplumberBackend(PdfBackend):
+    name = "pdfplumber"
+
+    def iter_pages(self, pdf_path):
+        import pdfplumber
+
+        with pdfplumber.open(pdf_path) as pdf:
+            yield from pdf.pages
+
+    def page_text(self, page):
+        return page.extract_text() or ""
+
+    def page_marker_text(self, page):
+        # Raw characters only, skipping pdfplumber's word/line clustering
+        return "".join(c["text"] for c in page.chars)
+
+    def release(self, page):
+        # Drop the cached layout objects of pages we are done with
+        page.flush_cache()
+
+
+class PdfiumBackend(PdfBackend):
+    # pdfium does the text extraction in C, so pages are yielded as text directly
+    name = "pypdfium2"
+
+    def iter_pages(self, pdf_path):
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for i in range(len(pdf)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+                yield text.replace("\r\n", "\n").replace("\r", "\n")
+        finally:
+            pdf.close()
+
+    def page_text(self, page):
+        return page
+
+
+class PypdfBackend(PdfBackend):
+    # Pure-Python engine, pages are yielded as text directly
+    name = "pypdf"
+
+    def iter_pages(self, pdf_path):
+        from pypdf import PdfReader
+
+        reader = PdfReader(pdf_path)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+    def page_text(self, page):
+        return page
+
+
+BACKENDS = {backend.name: backend for backend in (PdfplumberBackend, PdfiumBackend, PypdfBackend)}
+
+
+def get_backend(name):
+    """Return a backend instance by name."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend '{name}', choose from {sorted(BACKENDS)}") from None
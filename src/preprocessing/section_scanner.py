@@ -0,0 +1,78 @@
+"""
+One-pass section scanner for LER text files.
+
+All markers are compiled into a single alternation, so a file is scanned once no matter how many
+markers we look for. Sections come back as (start, stop) line offsets into the caller's list.
+"""
+import re
+from bisect import bisect_left
+from itertools import islice
+
+
+class ScanResult:
+    def __init__(self, positions, line_count):
+        self.positions = positions  # marker name -> sorted line indices where it occurs
+        self.line_count = line_count
+
+    def first(self, name):
+        # Index of the first line containing the marker, or None
+        hits = self.positions[name]
+        return hits[0] if hits else None
+
+    def next_after(self, name, idx):
+        # Index of the first line at or after idx containing the marker, or None
+        hits = self.positions[name]
+        k = bisect_left(hits, idx)
+        return hits[k] if k < len(hits) else None
+
+    def section(self, start_name, stop_name):
+        # (start, stop) offsets of the lines after the first start marker up to the next stop marker
+        start_idx = self.first(start_name)
+        if start_idx is None:
+            return None
+        start_idx += 1
+        stop_idx = self.next_after(stop_name, start_idx)
+        return start_idx, self.line_count if stop_idx is None else stop_idx
+
+
+class SectionScanner:
+    def __init__(self, markers):
+        # markers: {name: (literal, ignore_case)}
+        self.markers = markers
+        # Longest literals first, so "NRC FORM 366A" wins over "NRC FORM" at the same position
+        ordered = sorted(markers.items(), key=lambda kv: len(kv[1][0]), reverse=True)
+        self.pattern = re.compile("|".join(
+            f"(?P<{name}>{'(?i:' if ignore_case else '(?:'}{re.escape(literal)}))"
+            for name, (literal, ignore_case) in ordered
+        ))
+        # A match of one marker may also contain a shorter one ("NRC FORM 366A" contains "NRC FORM")
+        self.implied = {
+            name: [other for other, (other_literal, _) in markers.items()
+                   if other != name and other_literal.lower() in literal.lower()]
+            for name, (literal, _) in markers.items()
+        }
+
+    def _contains(self, name, text):
+        literal, ignore_case = self.markers[name]
+        return literal.lower() in text.lower() if ignore_case else literal in text
+
+    def scan(self, lines):
+        positions = {name: [] for name in self.markers}
+        for i, line in enumerate(lines):
+            for m in self.pattern.finditer(line):
+                name = m.lastgroup
+                hits = positions[name]
+                if not hits or hits[-1] != i:
+                    hits.append(i)
+                for other in self.implied[name]:
+                    other_hits = positions[other]
+                    if (not other_hits or other_hits[-1] != i) and self._contains(other, m.group()):
+                        other_hits.append(i)
+        return ScanResult(positions, len(lines))
+
+
+def join_section(lines, span):
+    # Join the lines of a section without copying the slice; "Not Found" for a missing or empty section
+    if span is None or span[0] >= span[1]:
+        return "Not Found"
+    return " ".join(islice(lines, span[0], span[1])).strip()
@@ -0,0 +1,254 @@
+"""
+Incremental runner for the numbered pipeline scripts.
+
+Each stage declares the files or directories it reads and writes. A stage is skipped, like make,
+when its script, the local modules it imports and its inputs are unchanged since its last successful run and its outputs exist.
+Stages whose inputs do not depend on each other's outputs run in parallel.
+
+Usage (from the repository root):
+    python src/run/pipeline.py                         # run whatever is out of date
+    python src/run/pipeline.py --stages text_to_df     # only these stages (and nothing downstream)
+    python src/run/pipeline.py --force                 # ignore the recorded state
+    python src/run/pipeline.py --incidents 0252022002R01 0252022003R00
+
+--incidents reruns only the named LERs in the stages that support it (partial=True below); the
+other stages run as usual if their inputs changed. Partial runs do not update the recorded state.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+STATE_PATH = os.path.join(ROOT, "data", "processed", "pipeline_state.json")
+
+
+class Stage:
+    def __init__(self, name, script, inputs, outputs, partial=False, helpers=()):
+        self.name = name
+        self.script = script  # Relative to src/; run with its own directory as cwd (scripts use ../../data paths)
+        self.helpers = helpers  # Local modules the script imports (directly or not), relative to src/; hashed with the script
+        self.inputs = inputs  # Relative to the repository root
+        self.outputs = outputs
+        self.partial = partial  # Honours PIPELINE_INCIDENTS
+
+    @property
+    def script_path(self):
+        return os.path.join(ROOT, "src", self.script)
+
+    @property
+    def code_paths(self):
+        return [self.script_path] + [os.path.join(ROOT, "src", helper) for helper in self.helpers]
+
+
+# Inputs produced by hand (ler_df_dateadded.csv, 2_ler_df_filtered_checked.csv, 3_ler_cfr.csv, ...) have no producing stage
+STAGES = [
+    Stage("ler_to_text", "preprocessing/1_ler_to_text.py",
+          inputs=["data/raw/ler"],
+          outputs=["data/processed/ler_text"], partial=True,
+          helpers=["preprocessing/pdf_backends.py"]),
+    Stage("text_to_df", "preprocessing/2_text_to_df.py",
+          inputs=["data/processed/ler_text"],
+          outputs=["data/processed/ler_df.csv", "data/processed/ler_df.parquet"], partial=True,
+          helpers=["preprocessing/section_scanner.py"]),
+    Stage("df_cleaner", "preprocessing/3_df_cleaner.py",
+          inputs=["data/processed/ler_df_dateadded.csv"],
+          outputs=["data/processed/ler_df_filtered.csv"],
+          helpers=["preprocessing/ler_store.py"]),
+    Stage("ler_to_cfr", "preprocessing/4_ler_to_cfr.py",
+          inputs=["data/processed/ler_cfr_empty.csv", "data/raw/ler"],
+          outputs=["data/processed/ler_filtered"]),
+    Stage("cfr_data", "preprocessing/5_cfr_data.py",
+          inputs=["data/processed/ler_cfr.csv"],
+          outputs=["data/processed/cfr_empty.csv"],
+          helpers=["preprocessing/ler_store.py"]),
+    Stage("clean_data", "preprocessing/6_clean_data.py",
+          inputs=["data/processed/2_ler_df_filtered_checked.csv"],
+          outputs=["data/processed/updated_ler_df.csv"],
+          helpers=["preprocessing/ler_store.py"]),
+    Stage("dedup_revisions", "preprocessing/6b_dedup_revisions.py",
+          inputs=["data/processed/2_updated_ler_df.csv"],
+          outputs=["data/processed/2_updated_ler_df_latest.csv", "data/processed/2_updated_ler_df_latest.parquet"],
+          helpers=["preprocessing/ler_store.py", "preprocessing/ler_revisions.py"]),
+    Stage("extract_entity_keyword", "knowledge_graph/7_extract_entity_keyword concise.py",
+          inputs=["data/processed/2_updated_ler_df_latest.csv", "data/processed/3_ler_cfr.csv"],
+          outputs=["data/processed/01030941_ler_kg_keyword_cocise.json"],
+          helpers=["knowledge_graph/schema_extraction.py", "knowledge_graph/extraction_schemas.py",
+                   "knowledge_graph/extraction_engine.py", "knowledge_graph/response_cache.py",
+                   "knowledge_graph/jsonl_checkpoint.py", "knowledge_graph/batch_planner.py",
+                   "knowledge_graph/structured_output.py", "preprocessing/ler_store.py"]),
+    Stage("kg", "knowledge_graph/8_kg.py",
+          inputs=["data/processed/01030941_ler_kg_keyword_cocise.json", "data/processed/3_cfr_concise.csv"],
+          outputs=[],
+          helpers=["knowledge_graph/graph_schema.py", "knowledge_graph/graph_loader.py", "knowledge_graph/graph_sync.py",
+                   "knowledge_graph/similarity_engine.py", "knowledge_graph/embedding_store.py",
+                   "preprocessing/ler_revisions.py"]),
+    Stage("restruct", "knowledge_graph/9_restruct.py",
+          inputs=["data/processed/01030941_ler_kg_keyword_cocise.json"],
+          outputs=[],
+          helpers=["knowledge_graph/graph_loader.py", "knowledge_graph/jsonl_checkpoint.py"]),
+    # Writes the separate humanerror database, so it runs alongside kg without contending for its locks
+    Stage("human_error_kg", "human_error/2_new_kg.py",
+          inputs=["src/human_error/kg_hr.json"],
+          outputs=[],
+          helpers=["knowledge_graph/graph_schema.py", "knowledge_graph/graph_loader.py", "knowledge_graph/graph_sync.py"]),
+]
+
+
+def _under(path, other):
+    return path == other or path.startswith(other.rstrip("/") + "/")
+
+
+def dependencies(stages):
+    # stage name -> names of the stages producing one of its inputs (or, for the graph scripts, running before it)
+    deps = {stage.name: set() for stage in stages}
+    for stage in stages:
+        for other in stages:
+            if other is stage:
+                continue
+            if any(_under(i, o) or _under(o, i) for i in stage.inputs for o in other.outputs):
+                deps[stage.name].add(other.name)
+    # 9_restruct works on the graph 8_kg builds, which has no file output to link them
+    names = {stage.name for stage in stages}
+    if "restruct" in names and "kg" in names:
+        deps["restruct"].add("kg")
+    return deps
+
+
+def fingerprint(stage):
+    # Digest of the script and its helper modules and of (path, size, mtime) for every input file;
+    # None if an input is missing
+    digest = hashlib.sha256()
+    for code_path in stage.code_paths:
+        with open(code_path, "rb") as f:
+            digest.update(f.read())
+    for rel in stage.inputs:
+        path = os.path.join(ROOT, rel)
+        if not os.path.exists(path):
+            return None
+        if os.path.isdir(path):
+            files = sorted(os.path.join(d, f) for d, _, fs in os.walk(path) for f in fs)
+        else:
+            files = [path]
+        for file_path in files:
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.relpath(file_path, ROOT)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_stage(stage, incidents=None):
+    # Run one script as a subprocess from its own directory; returns (returncode, seconds)
+    env = dict(os.environ)
+    if incidents and stage.partial:
+        env["PIPELINE_INCIDENTS"] = ",".join(sorted(incidents))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.basename(stage.script_path)],
+                          cwd=os.path.dirname(stage.script_path), env=env)
+    return proc.returncode, time.perf_counter() - start
+
+
+def run_pipeline(stages=STAGES, selected=None, force=False, incidents=None, jobs=None):
+    if selected:
+        unknown = set(selected) - {s.name for s in stages}
+        if unknown:
+            raise ValueError(f"Unknown stages: {sorted(unknown)}")
+        stages = [s for s in stages if s.name in selected]
+    deps = dependencies(stages)
+    by_name = {s.name: s for s in stages}
+    state = load_state()
+
+    done, failed, skipped = set(), set(), set()
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or len(stages)) as executor:
+        while True:
+            for stage in stages:
+                name = stage.name
+                if name in done or name in failed or name in running:
+                    continue
+                if deps[name] & failed:
+                    print(f"[{name}] not run: upstream stage failed")
+                    failed.add(name)
+                    continue
+                if not deps[name] <= done:
+                    continue
+
+                fp = fingerprint(stage)
+                if fp is None:
+                    print(f"[{name}] not run: missing input ({', '.join(stage.inputs)})")
+                    failed.add(name)
+                    continue
+                outputs_exist = all(os.path.exists(os.path.join(ROOT, o)) for o in stage.outputs)
+                up_to_date = state.get(name) == fp and outputs_exist
+                if not force and not incidents and up_to_date:
+                    print(f"[{name}] up to date, skipped")
+                    skipped.add(name)
+                    done.add(name)
+                    continue
+                if incidents and up_to_date and not stage.partial:
+                    print(f"[{name}] up to date, skipped (no per-incident mode)")
+                    skipped.add(name)
+                    done.add(name)
+                    continue
+
+                print(f"[{name}] running {stage.script}")
+                running[name] = executor.submit(run_stage, stage, incidents)
+
+            if not running:
+                break
+            finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future not in finished:
+                    continue
+                del running[name]
+                returncode, seconds = future.result()
+                if returncode == 0:
+                    print(f"[{name}] finished in {seconds:.1f}s")
+                    done.add(name)
+                    if not incidents:
+                        # Fingerprint after the run: outputs of upstream stages are final by now
+                        state[name] = fingerprint(by_name[name])
+                        save_state(state)
+                else:
+                    print(f"[{name}] failed with exit code {returncode}")
+                    failed.add(name)
+
+    print(f"Pipeline finished: {len(done) - len(skipped)} run, {len(skipped)} skipped, {len(failed)} failed.")
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the numbered pipeline scripts, skipping up-to-date stages.")
+    parser.add_argument("--stages", nargs="+", help="Only run these stages: " + ", ".join(s.name for s in STAGES))
+    parser.add_argument("--force", action="store_true", help="Run stages even if their inputs are unchanged")
+    parser.add_argument("--incidents", nargs="+", help="LER file names (without extension) for a partial rerun")
+    parser.add_argument("--jobs", type=int, default=None, help="Maximum number of stages running at once")
+    parser.add_argument("--list", action="store_true", help="List the stages and their dependencies")
+    args = parser.parse_args()
+
+    if args.list:
+        deps = dependencies(STAGES)
+        for stage in STAGES:
+            print(f"{stage.name:24} {stage.script:55} after: {', '.join(sorted(deps[stage.name])) or '-'}")
+        sys.exit(0)
+
+    ok = run_pipeline(selected=args.stages, force=args.force, incidents=set(args.incidents or []), jobs=args.jobs)
+    sys.exit(0 if ok else 1)
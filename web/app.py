@@ -1,9 +1,14 @@
 from flask import Flask, render_template, request, jsonify
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 from neo4j import GraphDatabase
 import openai
 import os
 from dotenv import load_dotenv
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "knowledge_graph"))
+from embedding_store import EmbeddingStore
 
 # Flask 애플리케이션 설정
 app = Flask(__name__)
@@ -15,7 +20,12 @@ password = "tkfkd7274"
 driver = GraphDatabase.driver(uri, auth=(username, password))
 
 # 모델 로드
-model = SentenceTransformer("all-MiniLM-L6-v2")
+MODEL_NAME = "all-MiniLM-L6-v2"
+model = SentenceTransformer(MODEL_NAME)
+
+# Keyword embeddings are shared with 8_kg.py through the on-disk store instead of being re-encoded per request
+EMBEDDING_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "processed", "embedding_store")
+embedding_store = EmbeddingStore(EMBEDDING_STORE_PATH, MODEL_NAME, model.get_sentence_embedding_dimension())
 
 # OpenAI API 키 설정
 load_dotenv()
@@ -26,10 +36,11 @@ def extract_keywords(question, graph_keywords):
     """
     Extract relevant keywords from the question.
     """
-    question_embedding = model.encode(question, convert_to_tensor=True)
-    keyword_embeddings = model.encode(graph_keywords, convert_to_tensor=True)
-    similarities = util.pytorch_cos_sim(question_embedding, keyword_embeddings).squeeze()
-    top_keywords = [graph_keywords[i] for i in similarities.argsort(descending=True)[:3]]
+    # Questions are one-off texts, so they are encoded directly and not added to the store
+    question_embedding = model.encode(question, convert_to_numpy=True, normalize_embeddings=True)
+    keyword_embeddings = embedding_store.encode(model, graph_keywords)
+    similarities = keyword_embeddings @ question_embedding
+    top_keywords = [graph_keywords[i] for i in np.argsort(-similarities)[:3]]
     return top_keywords
 
 # Neo4j 탐색 쿼리 실행